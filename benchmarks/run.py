@@ -0,0 +1,439 @@
+"""
+Performance benchmarks for the applications hot paths. Runs against synthetic data, a fake MetaTrader5 terminal and an
+SQLite database, and optionally against a PostgreSQL database. Results are written as JSON and can be compared with a
+previous run, failing if any benchmark has slowed by more than a threshold.
+
+Usage:
+    python -m benchmarks.run --output bench_results.json
+    python -m benchmarks.run --baseline bench_baseline.json --threshold 0.2
+    python -m benchmarks.run --postgres --postgres-database algotrader_bench
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from unittest.mock import patch
+
+import definitions
+
+# secrets.py holds the database password and shadows the standard library secrets module, so must be imported before
+# numpy imports the standard library module. It is only needed for PostgreSQL.
+try:
+    from secrets import secrets
+except ImportError:
+    secrets = {}
+
+import numpy as np
+import sqlalchemy as sal
+
+from benchmarks import synthetic
+
+# Benchmarks by name. Populated by the benchmark decorator.
+BENCHMARKS = {}
+
+# Benchmarks that use a database. Run once for each database backend.
+DATABASE_BENCHMARKS = {}
+
+# Start of the synthetic candles. Midnight 1 June 2021 UTC.
+START = 1622505600
+
+
+class Timer:
+    """
+    Times the repetitions of a benchmark. Iterate to repeat and time only the code in the measure block so that setup
+    for each repetition is excluded.
+    """
+
+    items = 1  # Number of items processed in each repetition, e.g. candles written. Used to report throughput.
+
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.times = []
+
+    def __iter__(self):
+        return iter(range(self.repeat))
+
+    @contextmanager
+    def measure(self):
+        start = time.perf_counter()
+        yield
+        self.times.append(time.perf_counter() - start)
+
+    def result(self):
+        median = statistics.median(self.times)
+        return {'median': median, 'min': min(self.times), 'max': max(self.times), 'repeat': len(self.times),
+                'items': self.items, 'items_per_second': self.items / median if median > 0 else None}
+
+
+def benchmark(database=False):
+    """
+    Registers a benchmark function. The function is called with the benchmark Env and a Timer.
+    :param database: Whether the benchmark uses a database and should run for each database backend
+    :return:
+    """
+    def register(func):
+        name = func.__name__[len('bench_'):]
+        (DATABASE_BENCHMARKS if database else BENCHMARKS)[name] = func
+        return func
+    return register
+
+
+class Env:
+    """
+    Shared state for benchmarks including the scale of the synthetic data, the fake MetaTrader5 terminal and the
+    database connection for database benchmarks.
+    """
+
+    backend = None  # The database backend for database benchmarks. sqlite or postgresql.
+    database = None  # The database for database benchmarks
+    candles = None  # A day of synthetic candles for a single symbol
+
+    def __init__(self, args, mt5):
+        self.args = args
+        self.mt5 = mt5
+        self.__dir = tempfile.TemporaryDirectory()
+        self.__num_databases = 0
+
+        ticks = synthetic.ticks(start=START, seconds=args.seconds, rate=args.rate)
+        self.candles = synthetic.candles(datasource_symbol_id=1, data=ticks)
+
+    def new_database(self, backend):
+        """
+        Creates an empty database
+        :param backend: sqlite or postgresql
+        :return:
+        """
+        from algotrader.connections.db import Database
+        from algotrader.model.base import Base
+        import algotrader.config as cfg
+
+        if backend == 'sqlite':
+            self.__num_databases += 1
+            path = os.path.join(self.__dir.name, f'bench{self.__num_databases}.db')
+            database = Database('sqlite', '', path, '', '')
+        else:
+            host = cfg.Config().get('database.host')
+            name = self.args.postgres_database
+            username = cfg.Config().get('database.username')
+            password = secrets.get('db_pass')
+
+            # Start from empty tables
+            engine = sal.create_engine(f'postgresql://{username}:{password}@{host}/{name}')
+            Base.metadata.drop_all(engine)
+            engine.dispose()
+
+            database = Database('postgresql', host, name, username, password)
+
+        if not database.connected:
+            raise RuntimeError(f"Could not connect to {backend} benchmark database.")
+
+        return database
+
+    def seed(self, backend):
+        """
+        Sets database to a new database for backend with symbols synced and a day of candles for symbol 1
+        :param backend: sqlite or postgresql
+        :return:
+        """
+        from algotrader.connections.ds import DataSource
+        from algotrader.data.sync import Sync
+
+        self.backend = backend
+        self.database = self.new_database(backend)
+        Sync.sync_symbols(datasources=DataSource.all_instances(), database=self.database)
+        self.database.add_candles(self.candles)
+
+    def close(self):
+        self.__dir.cleanup()
+
+
+@benchmark()
+def bench_mt5_get_symbols(env, timer):
+    from algotrader.connections.ds import DataSource
+
+    datasource = DataSource.instance('mt5')
+    timer.items = env.args.symbols
+    for _ in timer:
+        with timer.measure():
+            datasource.get_symbols()
+
+
+@benchmark(database=True)
+def bench_sync_symbols_initial(env, timer):
+    from algotrader.connections.ds import DataSource
+    from algotrader.data.sync import Sync
+
+    timer.items = env.args.symbols
+    for _ in timer:
+        database = env.new_database(env.backend)
+        with timer.measure():
+            Sync.sync_symbols(datasources=DataSource.all_instances(), database=database)
+
+    # There is only one PostgreSQL database, so the new databases above dropped the seeded tables. Seed them again for
+    # the benchmarks that follow.
+    if env.backend == 'postgresql':
+        env.seed(env.backend)
+
+
+@benchmark(database=True)
+def bench_sync_symbols_steady(env, timer):
+    from algotrader.connections.ds import DataSource
+    from algotrader.data.sync import Sync
+
+    Sync.sync_symbols(datasources=DataSource.all_instances(), database=env.database)
+    timer.items = env.args.symbols
+    for _ in timer:
+        with timer.measure():
+            Sync.sync_symbols(datasources=DataSource.all_instances(), database=env.database)
+
+
+@benchmark(database=True)
+def bench_db_get_datasource_symbols(env, timer):
+    timer.items = env.args.symbols
+    for _ in timer:
+        with timer.measure():
+            env.database.get_datasource_symbols()
+
+
+@benchmark(database=True)
+def bench_db_add_candles(env, timer):
+    # Each repetition writes a day of candles for a different synced symbol, as a sync of a new symbol would. The
+    # candle table grows by a day of candles with each repetition.
+    ids = [i for i in env.database.get_datasource_symbols()['id'] if i != 1]
+    if len(ids) < env.args.repeat:
+        raise RuntimeError(f"bench_db_add_candles needs at least {env.args.repeat + 1} symbols.")
+    timer.items = len(env.candles)
+    for i in timer:
+        candles = env.candles.assign(datasource_symbol_id=ids[i])
+        with timer.measure():
+            env.database.add_candles(candles)
+
+
+@benchmark(database=True)
+def bench_db_get_candles_hour(env, timer):
+    for _ in timer:
+        with timer.measure():
+            data = env.database.get_candles(1, from_time=START, to_time=START + 3600)
+    timer.items = len(data)
+
+
+@benchmark(database=True)
+def bench_db_get_candle_rollup_minute(env, timer):
+    for _ in timer:
+        with timer.measure():
+            env.database.get_candle_rollup(1, START, START + env.args.seconds, 60)
+    timer.items = len(env.candles)
+
+
+@benchmark(database=True)
+def bench_db_get_candle_rollup_second(env, timer):
+    for _ in timer:
+        with timer.measure():
+            env.database.get_candle_rollup(1, START, START + env.args.seconds, 1)
+    timer.items = len(env.candles)
+
+
+@benchmark()
+def bench_quality_detect(env, timer):
+    from algotrader.data.quality import DataQuality
+
+    timer.items = len(env.candles)
+    for _ in timer:
+        with timer.measure():
+            DataQuality.detect(env.candles)
+
+
+@benchmark()
+def bench_downsample_minmax(env, timer):
+    from algotrader.data import downsample
+
+    # The chart draws the low and high of each candle downsampled to its pixel width
+    x = np.repeat(env.candles['time'].to_numpy(dtype=float), 2)
+    y = np.column_stack((env.candles['bid_low'], env.candles['bid_high'])).ravel()
+    timer.items = len(x)
+    for _ in timer:
+        with timer.measure():
+            downsample.minmax(x, y, 1500)
+
+
+@benchmark()
+def bench_downsample_lttb(env, timer):
+    from algotrader.data import downsample
+
+    x = env.candles['time'].to_numpy(dtype=float)
+    y = env.candles['bid_close'].to_numpy()
+    timer.items = len(x)
+    for _ in timer:
+        with timer.measure():
+            downsample.lttb(x, y, 1500)
+
+
+@benchmark()
+def bench_chart_refresh(env, timer):
+    from algotrader.data.chartdata import ChartData
+    from algotrader.data.pricebus import COLUMNS, PriceBusReader, PriceBusWriter
+
+    # The charts refresh for a chart of the whole day. The last hour of candles arrive one at a time, each appended to
+    # the price bus then merged into the chart.
+    candles = env.candles[COLUMNS].to_numpy(dtype=float)
+    live = min(3600, len(candles))
+    timer.items = live
+    for _ in timer:
+        writer = PriceBusWriter(datasource_symbol_id=-1000, capacity=len(candles))
+        reader = PriceBusReader(datasource_symbol_id=-1000)
+        try:
+            writer.append(candles[:-live])
+            data = ChartData(datasource_symbol_id=-1000, bus=reader)
+            data.load(START, START + env.args.seconds, 1500)
+            with timer.measure():
+                for candle in candles[-live:]:
+                    writer.append(candle)
+                    data.update()
+            del data
+        finally:
+            reader.close()
+            writer.close()
+
+
+@benchmark(database=True)
+def bench_chart_load(env, timer):
+    from algotrader.data.chartdata import ChartData
+
+    # The chart loading a day from the database when opened, panned or zoomed
+    data = ChartData(datasource_symbol_id=1, database=env.database)
+    timer.items = len(env.candles)
+    for _ in timer:
+        with timer.measure():
+            data.load(START, START + env.args.seconds, 1500)
+
+
+def run(args):
+    """
+    Runs the benchmarks
+    :param args: Parsed command line
+    :return: Results by benchmark name
+    """
+    # Fake MetaTrader5 terminal, used by the datasources in place of MetaTrader5
+    mt5 = synthetic.FakeMetaTrader5(num_symbols=args.symbols, rate=args.rate)
+
+    import algotrader.config as cfg
+    cfg.Config().load(args.config)
+
+    results = {}
+    env = Env(args, mt5)
+    with patch('algotrader.connections.ds.MetaTrader5', mt5):
+        try:
+            for name, func in BENCHMARKS.items():
+                results[name] = _run_one(name, func, env, args)
+
+            for backend in args.backends:
+                if not any(_selected(f'{backend}.{name}', args) for name in DATABASE_BENCHMARKS):
+                    continue
+
+                env.seed(backend)
+
+                for name, func in DATABASE_BENCHMARKS.items():
+                    results[f'{backend}.{name}'] = _run_one(f'{backend}.{name}', func, env, args)
+        finally:
+            env.close()
+
+    return results
+
+
+def _run_one(name, func, env, args):
+    """
+    Runs a single benchmark if it matches the filter
+    :return: The result or None if the benchmark was filtered out
+    """
+    if not _selected(name, args):
+        return None
+
+    timer = Timer(args.repeat)
+    func(env, timer)
+    result = timer.result()
+    print(f"{name:45} {result['median'] * 1000:10.2f} ms {result['items_per_second'] or 0:14,.0f} items/s")
+
+    return result
+
+
+def _selected(name, args):
+    """
+    Whether a benchmark matches the filter
+    """
+    return args.filter is None or args.filter in name
+
+
+def compare(results, baseline, threshold):
+    """
+    Compares results with a baseline
+    :param results: Results by benchmark name
+    :param baseline: Baseline results by benchmark name
+    :param threshold: Proportion that the median time can increase by before it is a regression
+    :return: List of regression descriptions
+    """
+    regressions = []
+    for name, result in results.items():
+        if name in baseline:
+            change = result['median'] / baseline[name]['median'] - 1
+            if change > threshold:
+                regressions.append(f"{name} is {change:.0%} slower than baseline "
+                                   f"({result['median'] * 1000:.2f} ms vs {baseline[name]['median'] * 1000:.2f} ms).")
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='benchmarks', description="Algotrader performance benchmarks.")
+    parser.add_argument('--config', default=os.path.join(definitions.ROOT_DIR, 'benchmarks', 'benchconfig.yaml'),
+                        help="Config file for the benchmarks.")
+    parser.add_argument('--output', default='bench_results.json', help="File to write JSON results to.")
+    parser.add_argument('--baseline', help="JSON results from a previous run to compare against.")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Fail if any benchmark is this proportion slower than baseline. Default 0.2.")
+    parser.add_argument('--filter', help="Only run benchmarks with names containing this text.")
+    parser.add_argument('--repeat', type=int, default=5, help="Repetitions of each benchmark. Default 5.")
+    parser.add_argument('--symbols', type=int, default=1000, help="Number of symbols in the fake terminal.")
+    parser.add_argument('--seconds', type=int, default=86400, help="Seconds of candles to generate.")
+    parser.add_argument('--rate', type=float, default=5, help="Mean ticks per second.")
+    parser.add_argument('--postgres', action='store_true',
+                        help="Also run database benchmarks against PostgreSQL. Uses the host and username from the "
+                             "config, the password from secrets.py and the database named by --postgres-database, "
+                             "whose tables will be dropped.")
+    parser.add_argument('--postgres-database', help="PostgreSQL database for benchmarks. Required with --postgres. "
+                                                    "Must not be the applications database.")
+    args = parser.parse_args(argv)
+
+    if args.postgres and args.postgres_database is None:
+        parser.error("--postgres-database is required with --postgres as its tables will be dropped.")
+
+    logging.basicConfig(level=logging.WARNING)
+    args.backends = ['sqlite', 'postgresql'] if args.postgres else ['sqlite']
+
+    results = {name: result for name, result in run(args).items() if result is not None}
+
+    with open(args.output, 'w') as file:
+        json.dump({'timestamp': datetime.utcnow().isoformat(), 'python': platform.python_version(),
+                   'platform': platform.platform(), 'args': {key: value for key, value in vars(args).items()},
+                   'results': results}, file, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file)['results'], args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if len(regressions) > 0:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Synthetic data for benchmarks including:
+    * symbol and tick generators;
+    * aggregation of ticks into the 1 second candles stored in the database; and
+    * a fake MetaTrader5 module that serves generated symbols and ticks in place of the MetaTrader5 terminal.
+"""
+
+import zlib
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Symbol as returned by MetaTrader5.symbols_get. Only the properties used by the application.
+SymbolInfo = namedtuple('SymbolInfo', ['name', 'visible'])
+
+# Tick layout as returned by MetaTrader5.copy_ticks_range
+TICK_DTYPE = np.dtype([('time', '<i8'), ('bid', '<f8'), ('ask', '<f8'), ('last', '<f8'), ('volume', '<u8'),
+                       ('time_msc', '<i8'), ('flags', '<u4'), ('volume_real', '<f8')])
+
+
+def symbols(num_symbols: int, visible_ratio: float = 0.8, seed: int = 0) -> list:
+    """
+    Generates symbols
+    :param num_symbols: Number of symbols
+    :param visible_ratio: Proportion of symbols that are visible in MarketWatch
+    :param seed: Random seed
+    :return: List of SymbolInfo
+    """
+    rng = np.random.default_rng(seed)
+    visible = rng.random(num_symbols) < visible_ratio
+
+    return [SymbolInfo(name=f'SYM{i:05d}', visible=bool(visible[i])) for i in range(num_symbols)]
+
+
+def ticks(start: int, seconds: int, rate: float, price: float = 1.2, volatility: float = 0.00002,
+          spread: float = 0.0002, seed: int = 0) -> np.ndarray:
+    """
+    Generates a tick stream. Ticks arrive as a poisson process and the mid price follows a random walk with occasional
+    spikes. Spread varies around its mean.
+    :param start: Time of the first tick in seconds since epoch
+    :param seconds: Length of the stream in seconds
+    :param rate: Mean number of ticks per second
+    :param price: Starting mid price
+    :param volatility: Standard deviation of the log return between ticks
+    :param spread: Mean spread
+    :param seed: Random seed
+    :return: Structured array of ticks with TICK_DTYPE
+    """
+    rng = np.random.default_rng(seed)
+    num_ticks = rng.poisson(rate * seconds)
+
+    # Sorted arrival times in milliseconds
+    time_msc = np.sort(rng.integers(start * 1000, (start + seconds) * 1000, num_ticks))
+
+    # Random walk with a spike roughly every 10,000 ticks
+    returns = rng.normal(scale=volatility, size=num_ticks)
+    spikes = rng.random(num_ticks) < 0.0001
+    returns[spikes] += rng.choice([-1, 1], spikes.sum()) * volatility * 100
+    mid = price * np.exp(np.cumsum(returns))
+    half_spread = spread * rng.uniform(0.5, 1.5, num_ticks) / 2
+
+    data = np.zeros(num_ticks, dtype=TICK_DTYPE)
+    data['time'] = time_msc // 1000
+    data['time_msc'] = time_msc
+    data['bid'] = mid - half_spread
+    data['ask'] = mid + half_spread
+    data['volume'] = 1
+    data['volume_real'] = 1
+
+    return data
+
+
+def candles(datasource_symbol_id: int, data: np.ndarray) -> pd.DataFrame:
+    """
+    Aggregates ticks into 1 second candles
+    :param datasource_symbol_id: The DataSourceSymbol the ticks are for
+    :param data: Ticks with TICK_DTYPE, sorted by time
+    :return: Dataframe of candles with the columns of the candle table
+    """
+    times, starts, volume = np.unique(data['time'], return_index=True, return_counts=True)
+    ends = np.append(starts[1:], len(data)) - 1
+
+    result = {'datasource_symbol_id': datasource_symbol_id, 'time': times}
+    for side in ['bid', 'ask']:
+        result[f'{side}_open'] = data[side][starts]
+        result[f'{side}_high'] = np.maximum.reduceat(data[side], starts)
+        result[f'{side}_low'] = np.minimum.reduceat(data[side], starts)
+        result[f'{side}_close'] = data[side][ends]
+    result['volume'] = volume
+
+    return pd.DataFrame(result)
+
+
+class FakeMetaTrader5:
+    """
+    Serves generated symbols and ticks with the same interface as the MetaTrader5 module. Patch
+    algotrader.connections.ds.MetaTrader5 with an instance to use it.
+    """
+
+    def __init__(self, num_symbols: int = 100, rate: float = 5, seed: int = 0):
+        """
+        :param num_symbols: Number of symbols in the terminal
+        :param rate: Mean number of ticks per second for every symbol
+        :param seed: Random seed
+        """
+        self.__symbols = symbols(num_symbols, seed=seed)
+        self.__rate = rate
+        self.__seed = seed
+
+    def initialize(self, *args, **kwargs):
+        return True
+
+    def shutdown(self):
+        pass
+
+    def terminal_info(self):
+        return "FakeMetaTrader5"
+
+    def version(self):
+        return 500, 0, "fake"
+
+    def symbols_total(self):
+        return len(self.__symbols)
+
+    def symbols_get(self, *args, **kwargs):
+        return tuple(self.__symbols)
+
+    def copy_ticks_range(self, symbol, date_from, date_to, flags=None):
+        """
+        Ticks for the symbol between two datetimes. The same symbol and range always returns the same ticks.
+        """
+        start = int(date_from.timestamp())
+        seconds = int(date_to.timestamp()) - start
+        seed = zlib.crc32(f'{self.__seed}.{symbol}.{start}'.encode())
+
+        return ticks(start=start, seconds=seconds, rate=self.__rate, seed=seed)
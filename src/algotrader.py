@@ -7,6 +7,7 @@ import wxconfig as cfg
 import wx
 import wx.lib.mixins.inspection as wit
 from algotrader.gui.mdi_frame import MDIFrame
+from algotrader.metrics import Metrics
 
 
 class InspectionApp(wx.App, wit.InspectionMixin):
@@ -24,6 +25,9 @@ if __name__ == "__main__":
     log_config = cfg.Config().get('logging')
     logging.config.dictConfig(log_config)
 
+    # Configure instrumentation
+    Metrics.configure()
+
     # Do we have inspection turned on. Create correct version of app
     inspection = cfg.Config().get('developer.inspection')
     if inspection:
@@ -0,0 +1,148 @@
+"""
+Algotrader command line and daemon. Runs data tasks without the GUI so that they can be run on headless servers and
+spread across several machines. wx and the GUI modules are never imported.
+
+Usage:
+    python -m algotrader.cli sync
+    python -m algotrader.cli symbols --shard 0 --num-shards 2
+    python -m algotrader.cli daemon
+"""
+
+import argparse
+import logging.config
+import os
+import signal
+import sys
+import threading
+
+import definitions
+from secrets import secrets
+import algotrader.config as cfg
+from algotrader.connections.db import Database
+from algotrader.connections.ds import DataSource
+from algotrader.data.sync import Sync
+from algotrader.metrics import Metrics
+
+
+def main(argv=None):
+    """
+    Parses the command line and runs the requested command
+    :param argv: Command line arguments. Defaults to sys.argv.
+    :return: Exit code
+    """
+    parser = argparse.ArgumentParser(prog='algotrader', description="Algotrader headless data tasks.")
+    parser.add_argument('--config', default=os.path.join(definitions.ROOT_DIR, 'config.yaml'),
+                        help="Path to the config file. Defaults to the applications config.yaml.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('sync', help="Sync symbols from all datasources to the database.")
+    symbols_parser = subparsers.add_parser('symbols', help="List the symbols owned by a shard.")
+    symbols_parser.add_argument('--shard', type=int, default=0, help="The shard of symbols to list.")
+    symbols_parser.add_argument('--num-shards', type=int, default=1, help="The number of shards sharing the symbols.")
+    subparsers.add_parser('daemon', help="Sync symbols periodically until stopped.")
+    args = parser.parse_args(argv)
+
+    if args.command == 'symbols' and not 0 <= args.shard < args.num_shards:
+        parser.error(f"--shard must be between 0 and {args.num_shards - 1}.")
+
+    # Load the config and configure the logger
+    cfg.Config().load(args.config)
+    logging.config.dictConfig(cfg.Config().get('logging'))
+    log = logging.getLogger(__name__)
+
+    # Configure instrumentation
+    Metrics.configure()
+
+    database = _connect(log)
+    if database is None:
+        return 1
+
+    if args.command == 'sync':
+        data = _sync(log, DataSource.all_instances(), database)
+        if data is None:
+            return 1
+        log.info(f"{len(data)} symbols synced.")
+    elif args.command == 'symbols':
+        data = Sync.shard_symbols(database.get_datasource_symbols(), args.shard, args.num_shards)
+        for _, row in data.iterrows():
+            print(f"{row['id']}\t{row['datasource_name']}\t{row['symbol_name']}")
+    elif args.command == 'daemon':
+        _daemon(log, database)
+
+    return 0
+
+
+def _connect(log):
+    """
+    Connects to the database using the configured connection params
+    :param log: The logger
+    :return: The database, or None if it could not be connected
+    """
+    params = {
+        'dialect': cfg.Config().get('database.dialect'),
+        'host': cfg.Config().get('database.host'),
+        'database': cfg.Config().get('database.database'),
+        'username': cfg.Config().get('database.username'),
+        'password': secrets.get('db_pass')
+    }
+
+    # Check if any are not configured
+    for key in params.keys():
+        if params[key] is None:
+            log.error(f"Database connection param {key} is not configured.")
+            return None
+
+    database = Database(params['dialect'], params['host'], params['database'], params['username'], params['password'])
+
+    return database if database.connected else None
+
+
+def _sync(log, datasources, database):
+    """
+    Syncs symbols from the datasources to the database, logging rather than raising any error
+    :param log: The logger
+    :param datasources: The datasources
+    :param database: The database
+    :return: The synced symbols, or None if the sync failed
+    """
+    try:
+        data = Sync.sync_symbols(datasources=datasources, database=database)
+    except Exception:
+        log.exception("Symbol sync failed.")
+        return None
+
+    # The database logs and returns None rather than raising if it could not be updated
+    if data is None:
+        log.error("Symbol sync failed. Could not update the database.")
+
+    return data
+
+
+def _daemon(log, database):
+    """
+    Syncs symbols from the datasources every daemon.interval seconds until SIGINT or SIGTERM. A failed sync is logged
+    and retried at the next interval. Only one daemon should be run against a database so that symbols are not inserted
+    concurrently.
+    :param log: The logger
+    :param database: The database
+    :return:
+    """
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+
+    datasources = DataSource.all_instances()
+    interval = cfg.Config().get('daemon.interval')
+
+    log.info("Daemon started.")
+    while not stop.is_set():
+        data = _sync(log, datasources, database)
+        if data is not None:
+            log.debug(f"{len(data)} symbols synced.")
+
+        stop.wait(interval)
+
+    log.info("Daemon stopped.")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,22 @@
+"""
+Access to the applications config without loading wx.
+
+The wxconfig package imports its wx settings dialog when it is imported, so importing wxconfig.Config would load wx even
+when no GUI is needed. The Config class only depends on yaml, so its module is loaded directly from the wxconfig package
+and registered as wxconfig.config. If the GUI later imports wxconfig, it will use the same module and therefore the
+same Config singleton.
+"""
+
+import importlib.util
+import os
+import sys
+
+if 'wxconfig.config' not in sys.modules:
+    _spec = importlib.util.find_spec('wxconfig')
+    _path = os.path.join(_spec.submodule_search_locations[0], 'config.py')
+    _config_spec = importlib.util.spec_from_file_location('wxconfig.config', _path)
+    _module = importlib.util.module_from_spec(_config_spec)
+    sys.modules['wxconfig.config'] = _module
+    _config_spec.loader.exec_module(_module)
+
+Config = sys.modules['wxconfig.config'].Config
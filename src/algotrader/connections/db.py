@@ -8,9 +8,11 @@ import pandas as pd
 import sqlalchemy as sal
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
-import wxconfig as cfg
 
-from algotrader.model.base import Base, DataSource, DataSourceSymbol, Symbol
+import algotrader.config as cfg
+from algotrader.metrics import Metrics, timed
+from algotrader.model.base import Base, Candle, CandleRollup, DataQualityIssue, DataSource, DataSourceSymbol, Symbol, \
+    ROLLUP_INTERVALS
 
 
 class Database:
@@ -37,6 +39,7 @@ class Database:
 
         # Create engine and test
         self.__engine = sal.create_engine(f'{dialect}://{username}:{password}@{host}/{database}')
+        Metrics.instrument_engine(self.__engine)
 
         # Test
         try:
@@ -49,6 +52,7 @@ class Database:
         # Configure the database, creating any tables that don't already exist and populating DataSources
         self.__configure_db()
 
+    @timed('database.get_datasource_symbols', rows='return')
     def get_datasource_symbols(self) -> pd.DataFrame:
         """
         Returns a dataframe containing all symbols for the specified datasources
@@ -65,6 +69,7 @@ class Database:
 
         return data
 
+    @timed('database.update_datasource_symbols', rows='data')
     def update_datasource_symbols(self, data: pd.DataFrame) -> pd.DataFrame:
         """
         Updates datasource_symbols table with provided dataframe. Appends new rows and updates modified rows.
@@ -93,6 +98,188 @@ class Database:
 
         return self.get_datasource_symbols()
 
+    @timed('database.get_candles', rows='return')
+    def get_candles(self, datasource_symbol_id: int, from_time: int = None, to_time: int = None,
+                    limit: int = None) -> pd.DataFrame:
+        """
+        Returns the candles for a DataSourceSymbol in a time range
+        :param datasource_symbol_id: The id of the DataSourceSymbol
+        :param from_time: Start of the time range, inclusive. Seconds since epoch. None for no start.
+        :param to_time: End of the time range, exclusive. Seconds since epoch. None for no end.
+        :param limit: If set, only the latest limit candles in the time range are returned
+        :return: Dataframe of candles ordered by time
+        """
+        data = None
+        if self.connected:
+            query = sal.select(Candle).where(Candle.datasource_symbol_id == datasource_symbol_id)
+            if from_time is not None:
+                query = query.where(Candle.time >= from_time)
+            if to_time is not None:
+                query = query.where(Candle.time < to_time)
+            if limit is not None:
+                query = query.order_by(Candle.time.desc()).limit(limit)
+            else:
+                query = query.order_by(Candle.time)
+
+            try:
+                con = self.__engine.connect()
+                data = pd.read_sql(query, con=con)
+                con.close()
+            except SQLAlchemyError as ex:
+                self.__log.warning(f"Could not retrieve data from database. {ex}")
+
+            # Latest candles were read in reverse
+            if data is not None and limit is not None:
+                data = data.iloc[::-1].reset_index(drop=True)
+
+        return data
+
+    @timed('database.add_candles', rows='data')
+    def add_candles(self, data: pd.DataFrame) -> None:
+        """
+        Inserts candles and updates their rollups
+        :param data: Dataframe with columns datasource_symbol_id, time, bid and ask OHLC and volume
+        :return:
+        """
+        if self.connected and len(data) > 0:
+            with Session(self.__engine) as session:
+                session.bulk_insert_mappings(Candle, data.to_dict(orient='records'))
+
+                # Merge the new candles into their rollups. Existing rollups for the same buckets are read, merged with
+                # the new candles and replaced.
+                for interval in ROLLUP_INTERVALS:
+                    rollup = _rollup(data.assign(time=data['time'] - data['time'] % interval))
+                    where = (CandleRollup.interval == interval,
+                             CandleRollup.datasource_symbol_id.in_(rollup['datasource_symbol_id'].unique().tolist()),
+                             CandleRollup.time.between(int(rollup['time'].min()), int(rollup['time'].max())))
+                    existing = pd.read_sql(sal.select(CandleRollup).where(*where), con=session.connection())
+                    if len(existing) > 0:
+                        rollup = _rollup(pd.concat([existing, rollup], ignore_index=True))
+                        session.execute(sal.delete(CandleRollup).where(*where)
+                                        .execution_options(synchronize_session=False))
+
+                    rollup = rollup.assign(interval=interval)
+                    session.bulk_insert_mappings(CandleRollup, rollup.to_dict(orient='records'))
+
+                # Flush the session and commit
+                session.flush()
+                session.commit()
+
+    @timed('database.get_candle_rollup', rows='return')
+    def get_candle_rollup(self, datasource_symbol_id: int, from_time: int, to_time: int,
+                          interval: int) -> pd.DataFrame:
+        """
+        Returns the bid and ask range of candles for a DataSourceSymbol aggregated into buckets of interval seconds.
+        Used to read long time ranges at a coarser resolution.
+        :param datasource_symbol_id: The id of the DataSourceSymbol
+        :param from_time: Start of the time range, inclusive. Seconds since epoch.
+        :param to_time: End of the time range, exclusive. Seconds since epoch.
+        :param interval: Bucket size in seconds. 1 returns the range of every candle, otherwise one of ROLLUP_INTERVALS.
+        :return: Dataframe with columns time, bid_low, bid_high, ask_low, ask_high and volume, ordered by time
+        """
+        if interval != 1 and interval not in ROLLUP_INTERVALS:
+            raise ValueError(f"Candles are not rolled up into {interval} second buckets.")
+
+        data = None
+        if self.connected:
+            # 1 second candles are read as they are. Coarser intervals are read from their rollups.
+            table = Candle if interval == 1 else CandleRollup
+            query = sal.select(table.time, table.bid_low, table.bid_high, table.ask_low, table.ask_high, table.volume) \
+                .where(table.datasource_symbol_id == datasource_symbol_id, table.time >= from_time,
+                       table.time < to_time) \
+                .order_by(table.time)
+            if interval != 1:
+                query = query.where(CandleRollup.interval == interval)
+
+            try:
+                con = self.__engine.connect()
+                data = pd.read_sql(query, con=con)
+                con.close()
+            except SQLAlchemyError as ex:
+                self.__log.warning(f"Could not retrieve data from database. {ex}")
+
+        return data
+
+    @timed('database.get_data_quality_issues', rows='return')
+    def get_data_quality_issues(self, datasource_symbol_id: int, from_time: int = None, to_time: int = None,
+                                issue: str = None) -> pd.DataFrame:
+        """
+        Returns the data quality issues for a DataSourceSymbol that overlap a time range
+        :param datasource_symbol_id: The id of the DataSourceSymbol
+        :param from_time: Start of the time range, inclusive. Seconds since epoch. None for no start.
+        :param to_time: End of the time range, inclusive. Seconds since epoch. None for no end.
+        :param issue: If set, only issues of this type are returned
+        :return: Dataframe of issues ordered by from_time
+        """
+        data = None
+        if self.connected:
+            query = sal.select(DataQualityIssue) \
+                .where(DataQualityIssue.datasource_symbol_id == datasource_symbol_id) \
+                .order_by(DataQualityIssue.from_time)
+            if from_time is not None:
+                query = query.where(DataQualityIssue.to_time >= from_time)
+            if to_time is not None:
+                query = query.where(DataQualityIssue.from_time <= to_time)
+            if issue is not None:
+                query = query.where(DataQualityIssue.issue == issue)
+
+            try:
+                con = self.__engine.connect()
+                data = pd.read_sql(query, con=con)
+                con.close()
+            except SQLAlchemyError as ex:
+                self.__log.warning(f"Could not retrieve data from database. {ex}")
+
+        return data
+
+    @timed('database.add_data_quality_issues', rows='data')
+    def add_data_quality_issues(self, data: pd.DataFrame) -> None:
+        """
+        Inserts data quality issues
+        :param data: Dataframe with columns datasource_symbol_id, issue, from_time and to_time
+        :return:
+        """
+        if self.connected and len(data) > 0:
+            with Session(self.__engine) as session:
+                session.bulk_insert_mappings(DataQualityIssue, data.to_dict(orient='records'))
+
+                # Flush the session and commit
+                session.flush()
+                session.commit()
+
+    @timed('database.delete_data_quality_issues')
+    def delete_data_quality_issues(self, datasource_symbol_id: int, from_time: int, to_time: int,
+                                   issue: str = None) -> None:
+        """
+        Removes data quality issues for a DataSourceSymbol from a time range, e.g. once a gap has been backfilled.
+        Issues partly in the range are trimmed to the part outside it, or split in two if they extend either side of it.
+        :param datasource_symbol_id: The id of the DataSourceSymbol
+        :param from_time: Start of the time range, inclusive. Seconds since epoch.
+        :param to_time: End of the time range, inclusive. Seconds since epoch.
+        :param issue: If set, only issues of this type are removed
+        :return:
+        """
+        if self.connected:
+            where = [DataQualityIssue.datasource_symbol_id == datasource_symbol_id,
+                     DataQualityIssue.to_time >= from_time, DataQualityIssue.from_time <= to_time]
+            if issue is not None:
+                where.append(DataQualityIssue.issue == issue)
+
+            with Session(self.__engine) as session:
+                # Delete the issues overlapping the range, then insert the parts of them outside the range
+                existing = pd.read_sql(sal.select(DataQualityIssue).where(*where), con=session.connection())
+                session.execute(sal.delete(DataQualityIssue).where(*where)
+                                .execution_options(synchronize_session=False))
+
+                before = existing[existing['from_time'] < from_time].assign(to_time=from_time - 1)
+                after = existing[existing['to_time'] > to_time].assign(from_time=to_time + 1)
+                remaining = pd.concat([before, after], ignore_index=True).drop(columns='id')
+                session.bulk_insert_mappings(DataQualityIssue, remaining.to_dict(orient='records'))
+
+                # Flush the session and commit
+                session.flush()
+                session.commit()
+
     def __configure_db(self) -> None:
         """
         Creates all required tables in the database if they don't already exist. Updates DataSource table to ensure that
@@ -100,7 +287,13 @@ class Database:
         :return:
         """
         if self.connected:
+            # Rollups are backfilled from existing candles when their table is first created
+            rollups_exist = sal.inspect(self.__engine).has_table(CandleRollup.__tablename__)
+
             Base.metadata.create_all(self.__engine)
+            self.__migrate_db()
+            if not rollups_exist:
+                self.__backfill_rollups()
 
             # Get all datasources from db and get all from config. In db, create any from config that don't exist in db.
             config_datasources = cfg.Config().get('datasources')
@@ -121,6 +314,56 @@ class Database:
                 session.flush()
                 session.commit()
 
+    def __migrate_db(self) -> None:
+        """
+        Adds any columns and indexes missing from tables created by earlier versions of the application. create_all only
+        creates tables that don't exist, so does not update existing tables.
+        :return:
+        """
+        inspector = sal.inspect(self.__engine)
+        preparer = self.__engine.dialect.identifier_preparer
+        for table in Base.metadata.sorted_tables:
+            columns = [column['name'] for column in inspector.get_columns(table.name)]
+            indexes = [index['name'] for index in inspector.get_indexes(table.name)]
+
+            with self.__engine.begin() as con:
+                for column in table.columns:
+                    if column.name not in columns:
+                        self.__log.info(f"Adding column {column.name} to table {table.name}.")
+                        con.execute(sal.text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN "
+                                             f"{preparer.format_column(column)} "
+                                             f"{column.type.compile(dialect=self.__engine.dialect)}"))
+
+                for index in table.indexes:
+                    if index.name not in indexes:
+                        self.__log.info(f"Creating index {index.name} on table {table.name}.")
+                        index.create(con)
 
+    def __backfill_rollups(self) -> None:
+        """
+        Populates the rollups from the candles already in the database
+        :return:
+        """
+        with self.__engine.begin() as con:
+            for interval in ROLLUP_INTERVALS:
+                bucket = (Candle.time - Candle.time % interval).label('time')
+                query = sal.select(Candle.datasource_symbol_id, sal.literal(interval).label('interval'), bucket,
+                                   sal.func.min(Candle.bid_low), sal.func.max(Candle.bid_high),
+                                   sal.func.min(Candle.ask_low), sal.func.max(Candle.ask_high),
+                                   sal.func.sum(Candle.volume)) \
+                    .where(Candle.time.isnot(None)) \
+                    .group_by(Candle.datasource_symbol_id, bucket)
+                con.execute(sal.insert(CandleRollup).from_select(
+                    ['datasource_symbol_id', 'interval', 'time', 'bid_low', 'bid_high', 'ask_low', 'ask_high',
+                     'volume'], query))
 
 
+def _rollup(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregates candles or rollups by symbol and time
+    :param data: Dataframe with columns datasource_symbol_id, time, bid_low, bid_high, ask_low, ask_high and volume
+    :return: Dataframe with the same columns and one row per symbol and time
+    """
+    return data.groupby(['datasource_symbol_id', 'time'], as_index=False) \
+        .agg(bid_low=('bid_low', 'min'), bid_high=('bid_high', 'max'), ask_low=('ask_low', 'min'),
+             ask_high=('ask_high', 'max'), volume=('volume', 'sum'))
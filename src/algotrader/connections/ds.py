@@ -5,8 +5,12 @@ The DataSource interface and an implementation for MetaTrader5
 import abc
 import importlib
 import logging
-import MetaTrader5
-import wxconfig
+import algotrader.config as cfg
+from algotrader.metrics import timed
+
+# MetaTrader5 is only available on Windows, so is imported when the first MT5DataSource is created rather than with this
+# module. This allows the module to be imported on other platforms, e.g. by the headless command line on a server.
+MetaTrader5 = None
 
 
 class DataSource:
@@ -17,6 +21,20 @@ class DataSource:
     name = None  # The name of the datasource
     _params = None  # Connection params. Protected (_) as params will need to be accessed by subclasses.
 
+    # Methods that are instrumented in every implementation
+    _instrumented = ['get_symbols']
+
+    def __init_subclass__(cls, **kwargs):
+        """
+        Instruments the implementations of the DataSource interface methods
+        :param kwargs:
+        :return:
+        """
+        super().__init_subclass__(**kwargs)
+        for method in cls._instrumented:
+            if method in cls.__dict__:
+                setattr(cls, method, timed(f"datasource.{cls.__name__}.{method}", rows='return')(cls.__dict__[method]))
+
     def __init__(self, name: str, params: dict) -> None:
         """
         Construct the connection and store the connection params
@@ -32,7 +50,7 @@ class DataSource:
         :param name:
         :return:
         """
-        params = wxconfig.Config().get(f"datasources.{name}")
+        params = cfg.Config().get(f"datasources.{name}")
         fullclasspath = params['class']
         poslastdot = fullclasspath.rfind('.')
         modulename = fullclasspath[0:poslastdot]
@@ -49,7 +67,7 @@ class DataSource:
         Retruns a list of all DataSources
         :return:
         """
-        all_ds_names = wxconfig.Config().get("datasources")
+        all_ds_names = cfg.Config().get("datasources")
 
         all_datasources = []
         for ds_name in all_ds_names:
@@ -74,6 +92,11 @@ class MT5DataSource(DataSource):
         # Super
         DataSource.__init__(self, name=name, params=params)
 
+        # Import MetaTrader5 if not already imported
+        global MetaTrader5
+        if MetaTrader5 is None:
+            import MetaTrader5
+
         # Connect to MetaTrader5. Opens if not already open.
 
         # Logger
@@ -92,7 +115,8 @@ class MT5DataSource(DataSource):
 
     def __del__(self):
         # shut down connection to the MetaTrader 5 terminal
-        MetaTrader5.shutdown()
+        if MetaTrader5 is not None:
+            MetaTrader5.shutdown()
 
     def get_symbols(self):
         """
@@ -0,0 +1,170 @@
+"""
+The data behind a price chart, kept separate from the chart window so that it can be used and benchmarked without wx.
+
+The bid and ask lines for a view of a DataSourceSymbol are downsampled to the minimum and maximum in each pixel, so the
+number of points does not depend on the length of the time range being viewed. Long time ranges are read from the
+databases rollups. New candles from the price bus are merged into the pixels already drawn, so the lines stay at about 2
+points per pixel as the chart updates.
+"""
+
+import logging
+import math
+
+import numpy as np
+
+from algotrader.data import downsample
+from algotrader.data.pricebus import COLUMNS
+from algotrader.model.base import ROLLUP_INTERVALS
+
+# The resolutions in seconds that candles are read from the database at. 1 second candles or one of their rollups. The
+# coarsest resolution that still gives at least one candle per pixel is used.
+INTERVALS = [1] + ROLLUP_INTERVALS
+
+# The price lines drawn
+SIDES = ['bid', 'ask']
+
+
+class ChartData:
+    """
+    The bid and ask lines for a view of a DataSourceSymbol. Each line runs through the low and high of every candle in
+    the view, downsampled to the minimum and maximum in each pixel.
+    """
+
+    datasource_symbol_id = None  # The DataSourceSymbol being charted
+    start = None  # Start of the view in seconds since epoch
+    end = None  # End of the view in seconds since epoch
+    width = None  # Width of the view in pixels
+    last_time = None  # Time of the latest candle read from the price bus, in or out of view. None if none read.
+    lines = None  # x and y of the line for each side
+
+    __log = None  # The logger
+    __database = None  # The database to read candles from. None to only chart candles from the price bus.
+    __bus = None  # Reader for live candles. None if there is no live feed for this DataSourceSymbol.
+    __bus_count = 0  # The price bus count at the last read
+
+    def __init__(self, datasource_symbol_id: int, database=None, bus=None) -> None:
+        """
+        :param datasource_symbol_id: The DataSourceSymbol to chart
+        :param database: The database to read candles from. None to only chart candles from the price bus.
+        :param bus: PriceBusReader for live candles. None if there is no live feed.
+        """
+        self.__log = logging.getLogger(__name__)
+
+        self.datasource_symbol_id = datasource_symbol_id
+        self.__database = database
+        self.__bus = bus
+        self.lines = {side: (np.empty(0), np.empty(0)) for side in SIDES}
+
+    @property
+    def seconds_per_pixel(self) -> float:
+        """
+        The time range covered by each pixel of the view
+        :return:
+        """
+        return (self.end - self.start) / self.width
+
+    @property
+    def following(self) -> bool:
+        """
+        Whether the view contains the latest candle, so should scroll to follow new candles. Also true if no candles
+        have been read from the price bus yet.
+        :return:
+        """
+        return self.last_time is None or self.start <= self.last_time <= self.end
+
+    def load(self, start: float, end: float, width: int) -> None:
+        """
+        Loads the lines for a view from the database and price bus
+        :param start: Start of the view in seconds since epoch
+        :param end: End of the view in seconds since epoch
+        :param width: Width of the view in pixels
+        :return:
+        """
+        self.start, self.end, self.width = start, end, max(1, width)
+
+        # The coarsest resolution that gives at least one candle per pixel. Buckets are read from the start of the
+        # bucket containing the start of the view, so the view is filled up to its left edge.
+        interval = max([i for i in INTERVALS if i <= self.seconds_per_pixel], default=1)
+        data = None
+        if self.__database is not None:
+            from_time = math.floor(start) - math.floor(start) % interval
+            data = self.__database.get_candle_rollup(self.datasource_symbol_id, from_time, math.ceil(end), interval)
+
+        # Candles from the price bus in the view that are newer than the last bucket read from the database
+        last_time = data['time'].iloc[-1] + interval - 1 if data is not None and len(data) > 0 else -math.inf
+        bus_candles = np.empty((0, len(COLUMNS)))
+        if self.__bus is not None:
+            try:
+                self.__bus_count, candles = self.__bus.latest(self.__bus.capacity)
+                times = candles[:, COLUMNS.index('time')]
+                if len(candles) > 0:
+                    self.last_time = times[-1]
+                bus_candles = candles[(times > last_time) & (times >= start) & (times <= end)]
+            except (TimeoutError, FileNotFoundError) as ex:
+                self.__log.debug(ex)
+
+        times = bus_candles[:, COLUMNS.index('time')]
+        for side in SIDES:
+            lows = bus_candles[:, COLUMNS.index(f'{side}_low')]
+            highs = bus_candles[:, COLUMNS.index(f'{side}_high')]
+            if data is not None:
+                side_times = np.concatenate((data['time'].to_numpy(dtype=float), times))
+                lows = np.concatenate((data[f'{side}_low'].to_numpy(dtype=float), lows))
+                highs = np.concatenate((data[f'{side}_high'].to_numpy(dtype=float), highs))
+            else:
+                side_times = times
+            self.lines[side] = downsample.minmax_grid(*_points(side_times, lows, highs), self.start,
+                                                      self.seconds_per_pixel)
+
+    def update(self) -> bool:
+        """
+        Merges the candles written to the price bus since the last load or update into the lines. Points already in the
+        pixel of the first new candle are downsampled again together with the new candles. Candles outside the view are
+        not added.
+        :return: Whether the lines changed
+        :raises TimeoutError: If the price bus writer has stalled
+        :raises FileNotFoundError: If the price bus has been replaced by a new writer
+        """
+        if self.__bus is None:
+            return False
+
+        # New candles since last read. Nothing to do if there are none.
+        self.__bus_count, candles = self.__bus.since(self.__bus_count)
+        if len(candles) == 0:
+            return False
+
+        times = candles[:, COLUMNS.index('time')]
+        self.last_time = times[-1]
+        candles = candles[(times >= self.start) & (times <= self.end)]
+        if len(candles) == 0:
+            return False
+
+        seconds_per_pixel = self.seconds_per_pixel
+        times = candles[:, COLUMNS.index('time')]
+        pixel_start = self.start + math.floor((times.min() - self.start) / seconds_per_pixel) * seconds_per_pixel
+        for side in SIDES:
+            x, y = self.lines[side]
+            new_x, new_y = _points(times, candles[:, COLUMNS.index(f'{side}_low')],
+                                   candles[:, COLUMNS.index(f'{side}_high')])
+
+            # Points from the pixel of the first new candle onwards, merged with the new candles in time order
+            tail = np.searchsorted(x, pixel_start, side='left')
+            tail_x = np.concatenate((x[tail:], new_x))
+            tail_y = np.concatenate((y[tail:], new_y))
+            order = np.argsort(tail_x, kind='stable')
+            tail_x, tail_y = downsample.minmax_grid(tail_x[order], tail_y[order], self.start, seconds_per_pixel)
+
+            self.lines[side] = (np.concatenate((x[:tail], tail_x)), np.concatenate((y[:tail], tail_y)))
+
+        return True
+
+
+def _points(times: np.ndarray, lows: np.ndarray, highs: np.ndarray) -> (np.ndarray, np.ndarray):
+    """
+    Converts candles to a single series running through the low and high of each candle
+    :param times: Candle times
+    :param lows: Candle lows
+    :param highs: Candle highs
+    :return: x and y
+    """
+    return np.repeat(times, 2), np.column_stack((lows, highs)).ravel()
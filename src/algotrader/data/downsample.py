@@ -0,0 +1,119 @@
+"""
+Downsampling of price series for display. Reduces a series to a number of points proportional to the number of pixels it
+will be drawn across while preserving its visual shape. Includes:
+    * min / max per pixel bucket, which preserves every peak and trough, over the range of the series or over a fixed
+      grid so that new points can be merged into the buckets already drawn; and
+    * Largest Triangle Three Buckets (LTTB), which preserves the overall shape with fewer points.
+"""
+
+import numpy as np
+
+
+def minmax(x: np.ndarray, y: np.ndarray, buckets: int) -> (np.ndarray, np.ndarray):
+    """
+    Splits the x range into equal width buckets and returns the minimum and maximum point from each, in x order.
+    :param x: Sorted x values
+    :param y: y values
+    :param buckets: Number of buckets. Usually the pixel width that the series will be drawn across.
+    :return: Downsampled x and y. At most 2 * buckets points.
+    """
+    if len(x) <= 2 * buckets:
+        return x, y
+
+    # Start index of each non empty bucket
+    edges = np.linspace(x[0], x[-1], buckets + 1)[:-1]
+    starts = np.unique(np.searchsorted(x, edges, side='left'))
+
+    return _minmax(x, y, starts)
+
+
+def minmax_grid(x: np.ndarray, y: np.ndarray, origin: float, width: float) -> (np.ndarray, np.ndarray):
+    """
+    Splits x into buckets of a fixed width starting from origin and returns the minimum and maximum point from each, in
+    x order. As the buckets do not depend on the range of x, a downsampled series can be extended by downsampling the
+    points in its last bucket again together with the new points.
+    :param x: Sorted x values
+    :param y: y values
+    :param origin: The start of the first bucket
+    :param width: The width of each bucket. Usually the x range that one pixel is drawn across.
+    :return: Downsampled x and y. At most 2 points per bucket.
+    """
+    if len(x) == 0:
+        return x, y
+
+    # Start index of each non empty bucket
+    bucket = np.floor((x - origin) / width)
+    starts = np.flatnonzero(np.diff(bucket, prepend=bucket[0] - 1))
+
+    return _minmax(x, y, starts)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> (np.ndarray, np.ndarray):
+    """
+    Largest Triangle Three Buckets downsampling. Keeps the first and last points and, for each bucket in between, the
+    point that forms the largest triangle with the point kept from the previous bucket and the average of the next.
+    :param x: Sorted x values
+    :param y: y values
+    :param threshold: Number of points to return
+    :return: Downsampled x and y
+    """
+    if threshold >= len(x) or threshold < 3:
+        return x, y
+
+    # Bucket boundaries for all points except the first and last
+    bounds = np.linspace(1, len(x) - 1, threshold - 1).astype(int)
+    idx = np.empty(threshold, dtype=int)
+    idx[0] = 0
+    idx[-1] = len(x) - 1
+
+    # Average point of every bucket, used as the third point of the triangle
+    counts = np.diff(bounds)
+    avg_x = np.add.reduceat(x[:-1], bounds[:-1]) / counts
+    avg_y = np.add.reduceat(y[:-1], bounds[:-1]) / counts
+    avg_x = np.append(avg_x[1:], x[-1])
+    avg_y = np.append(avg_y[1:], y[-1])
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = bounds[i], bounds[i + 1]
+        area = np.abs((x[a] - avg_x[i]) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y[i] - y[a]))
+        a = start + int(np.argmax(area))
+        idx[i + 1] = a
+
+    return x[idx], y[idx]
+
+
+def _minmax(x: np.ndarray, y: np.ndarray, starts: np.ndarray) -> (np.ndarray, np.ndarray):
+    """
+    Returns the minimum and maximum point from each bucket, in x order
+    :param x: Sorted x values
+    :param y: y values
+    :param starts: Start index of each non empty bucket
+    :return: Downsampled x and y
+    """
+    # Bucket of every point, then the min and max value of each bucket
+    lengths = np.diff(np.append(starts, len(x)))
+    bucket = np.repeat(np.arange(len(starts)), lengths)
+    mins = np.minimum.reduceat(y, starts)
+    maxs = np.maximum.reduceat(y, starts)
+
+    # Index of the first point in each bucket that holds the min and the max
+    min_idx = _first_per_bucket(np.flatnonzero(y == mins[bucket]), bucket)
+    max_idx = _first_per_bucket(np.flatnonzero(y == maxs[bucket]), bucket)
+
+    # Interleave so that the min and max of each bucket are in x order. Keep a single point once.
+    idx = np.column_stack((np.minimum(min_idx, max_idx), np.maximum(min_idx, max_idx))).ravel()
+    idx = idx[np.append(True, np.diff(idx) != 0)]
+
+    return x[idx], y[idx]
+
+
+def _first_per_bucket(idx: np.ndarray, bucket: np.ndarray) -> np.ndarray:
+    """
+    Returns the first index from idx for each bucket
+    :param idx: Sorted indices of points
+    :param bucket: The bucket of every point
+    :return: One index per bucket
+    """
+    _, first = np.unique(bucket[idx], return_index=True)
+    return idx[first]
@@ -0,0 +1,338 @@
+"""
+A shared memory price bus for distributing the latest candles for a DataSourceSymbol between processes.
+
+Each DataSourceSymbol has its own fixed layout block of shared memory containing a small header and a ring buffer of
+candles. A single PriceBusWriter appends candles and any number of PriceBusReaders, in this or other processes, map the
+latest candles as numpy views without copying and without a round trip to the database.
+
+Readers do not lock. The writer increments a sequence number before and after every write (odd while a write is in
+progress) and readers retry until they observe the same even sequence number before and after locating their view.
+Every candle is written twice, at position i and i + capacity, so that the latest n candles are always a contiguous
+slice of the buffer and can be returned as a single view.
+
+A writer that dies mid write leaves the sequence odd, so readers give up after a timeout rather than retrying forever.
+The block left behind by a writer that died is reused by the next writer for the DataSourceSymbol, which resets the
+count to 0 so that attached readers read its candles from the start. A block is never taken over while the process of
+the writer that created it is still running. If the new writer has a different capacity the block is replaced instead.
+Readers still attached to the replaced block get FileNotFoundError, the same as when there is no writer, and must attach
+again to read from the new block.
+"""
+
+import ctypes
+import os
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+import algotrader.config as cfg
+
+# The columns of each candle in the ring buffer. Time is seconds since epoch (UTC).
+COLUMNS = ['time', 'bid_open', 'bid_high', 'bid_low', 'bid_close', 'ask_open', 'ask_high', 'ask_low', 'ask_close',
+           'volume']
+
+# Header layout. All header values are int64.
+_SEQUENCE = 0  # Incremented before and after each write. Odd while a write is in progress.
+_COUNT = 1  # Total number of candles ever written
+_CAPACITY = 2  # Number of candles held in the ring buffer. 0 until the writer is ready and once the block is replaced.
+_PID = 3  # Process id of the writer
+_HEADER_SIZE = 4
+
+# Names of the shared memory blocks created by writers in this process
+_created = set()
+
+
+def shared_memory_name(datasource_symbol_id: int) -> str:
+    """
+    The name of the shared memory block for a DataSourceSymbol
+    :param datasource_symbol_id: The id of the DataSourceSymbol
+    :return: The shared memory block name
+    """
+    return f"algotrader_pricebus_{datasource_symbol_id}"
+
+
+class PriceBusWriter:
+    """
+    Creates the shared memory block for a DataSourceSymbol and appends candles to it. There can only be one writer per
+    DataSourceSymbol.
+    """
+
+    datasource_symbol_id = None  # The DataSourceSymbol that this bus carries candles for
+    capacity = None  # Number of candles held in the ring buffer
+
+    __shm = None  # The shared memory block
+    __header = None  # Header view onto the shared memory
+    __data = None  # Candle view onto the shared memory. 2 * capacity rows.
+
+    def __init__(self, datasource_symbol_id: int, capacity: int = None) -> None:
+        """
+        Creates the shared memory block for the DataSourceSymbol
+        :param datasource_symbol_id: The id of the DataSourceSymbol
+        :param capacity: Number of candles to hold. If None, the configured price_bus.capacity will be used.
+        :raises FileExistsError: If there is already a writer for the DataSourceSymbol
+        """
+        self.datasource_symbol_id = datasource_symbol_id
+        self.capacity = capacity if capacity is not None else cfg.Config().get('price_bus.capacity')
+
+        name = shared_memory_name(datasource_symbol_id)
+        size = (_HEADER_SIZE + 2 * self.capacity * len(COLUMNS)) * np.dtype(np.float64).itemsize
+        try:
+            self.__shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            self.__shm = _reuse(name, self.capacity, size)
+        _created.add(self.__shm.name)
+        self.__header, self.__data = _views(self.__shm, self.capacity)
+
+        # Mark a write in progress while resetting so that readers of a reused block do not read the old candles.
+        # Readers see the count go back to 0 and read from the start.
+        header = self.__header
+        header[_SEQUENCE] |= 1
+        header[_COUNT] = 0
+        header[_CAPACITY] = self.capacity
+        header[_PID] = os.getpid()
+        header[_SEQUENCE] += 1
+
+    def append(self, candles: np.ndarray) -> None:
+        """
+        Appends candles to the ring buffer.
+        :param candles: An array of shape (n, len(COLUMNS)) or a single candle of shape (len(COLUMNS),)
+        :return:
+        """
+        candles = np.atleast_2d(candles)
+
+        # Only the latest capacity candles can be held
+        if len(candles) > self.capacity:
+            skipped = len(candles) - self.capacity
+            candles = candles[skipped:]
+        else:
+            skipped = 0
+
+        header = self.__header
+        count = int(header[_COUNT]) + skipped
+        positions = (count + np.arange(len(candles))) % self.capacity
+
+        # Odd sequence while writing. Write candles to both halves, then publish the new count and even sequence.
+        header[_SEQUENCE] += 1
+        self.__data[positions] = candles
+        self.__data[positions + self.capacity] = candles
+        header[_COUNT] = count + len(candles)
+        header[_SEQUENCE] += 1
+
+    def close(self) -> None:
+        """
+        Closes and removes the shared memory block. Readers that are still attached will keep their mapping until they
+        close.
+        :return:
+        """
+        if self.__shm is not None:
+            self.__header = None
+            self.__data = None
+            self.__shm.close()
+            self.__shm.unlink()
+            _created.discard(self.__shm.name)
+            self.__shm = None
+
+
+class PriceBusReader:
+    """
+    Attaches to the shared memory block for a DataSourceSymbol and provides lock free, zero copy views of the latest
+    candles.
+    """
+
+    datasource_symbol_id = None  # The DataSourceSymbol that this bus carries candles for
+    capacity = None  # Number of candles held in the ring buffer
+    timeout = None  # Seconds to wait for a write in progress to finish before giving up
+
+    __shm = None  # The shared memory block
+    __header = None  # Header view onto the shared memory
+    __data = None  # Candle view onto the shared memory. 2 * capacity rows.
+
+    def __init__(self, datasource_symbol_id: int, timeout: float = 0.1) -> None:
+        """
+        Attaches to the shared memory block created by the PriceBusWriter for the DataSourceSymbol
+        :param datasource_symbol_id: The id of the DataSourceSymbol
+        :param timeout: Seconds to wait for a write in progress to finish before giving up. A write takes microseconds,
+            so a write that takes longer means that the writer has died mid write.
+        :raises FileNotFoundError: If there is no writer for the DataSourceSymbol, or it has not finished creating the
+            block
+        """
+        self.datasource_symbol_id = datasource_symbol_id
+        self.timeout = timeout
+
+        name = shared_memory_name(datasource_symbol_id)
+        self.__shm = shared_memory.SharedMemory(name=name, create=False)
+
+        # The writer owns the block. If it is in another process, stop the resource tracker from unlinking the block
+        # when this process exits.
+        if self.__shm.name not in _created:
+            resource_tracker.unregister(self.__shm._name, 'shared_memory')
+
+        # The capacity is 0 until the writer has initialised the header
+        self.capacity = int(np.ndarray((_HEADER_SIZE,), dtype=np.int64, buffer=self.__shm.buf)[_CAPACITY])
+        if self.capacity == 0:
+            self.__shm.close()
+            self.__shm = None
+            raise FileNotFoundError(f"Price bus for DataSourceSymbol {datasource_symbol_id} is not ready.")
+        self.__header, self.__data = _views(self.__shm, self.capacity)
+        self.__data.flags.writeable = False
+
+    @property
+    def count(self) -> int:
+        """
+        The total number of candles written to the bus
+        :return:
+        """
+        return int(self.__header[_COUNT])
+
+    def latest(self, n: int) -> (int, np.ndarray):
+        """
+        Returns a read only view of the latest n candles, or fewer if fewer have been written. The view is not copied
+        and remains valid until the writer has appended a further capacity - n candles, which can be checked with
+        is_valid.
+        :param n: The number of candles required. Must not exceed capacity.
+        :return: The count of candles written at the time of the read and a view of shape (n, len(COLUMNS))
+        :raises TimeoutError: If a write is still in progress after timeout
+        :raises FileNotFoundError: If the block has been replaced by a writer with a different capacity
+        """
+        if n > self.capacity:
+            raise ValueError(f"Cannot read {n} candles from a price bus with capacity {self.capacity}.")
+
+        return self.__read(lambda count: n)
+
+    def since(self, count: int) -> (int, np.ndarray):
+        """
+        Returns a read only view of the candles written since count. If more than capacity candles have been written
+        since count, only the latest capacity candles will be returned. If the bus has been reset by a new writer since
+        count, all of its candles will be returned.
+        :param count: The count returned by a previous call to latest or since
+        :return: The count of candles written at the time of the read and a view of the new candles
+        :raises TimeoutError: If a write is still in progress after timeout
+        :raises FileNotFoundError: If the block has been replaced by a writer with a different capacity
+        """
+        return self.__read(lambda current: current - count if current >= count else current)
+
+    def is_valid(self, count: int, n: int) -> bool:
+        """
+        Whether a view of n candles read when the bus contained count candles has not yet been overwritten
+        :param count: The count returned with the view
+        :param n: The number of candles in the view
+        :return:
+        """
+        return self.count - count <= self.capacity - n
+
+    def close(self) -> None:
+        """
+        Detaches from the shared memory block. Any views returned by this reader must no longer be used.
+        :return:
+        """
+        if self.__shm is not None:
+            self.__header = None
+            self.__data = None
+            self.__shm.close()
+            self.__shm = None
+
+    def __read(self, size_for) -> (int, np.ndarray):
+        """
+        Lock free read of the latest candles.
+        :param size_for: Function returning the number of candles required given the current count
+        :return: The count of candles written at the time of the read and a view of the candles
+        :raises TimeoutError: If a write is still in progress after timeout
+        :raises FileNotFoundError: If the block has been replaced by a writer with a different capacity
+        """
+        header = self.__header
+        deadline = None
+        while True:
+            sequence = int(header[_SEQUENCE])
+            if sequence % 2 == 0:
+                if int(header[_CAPACITY]) != self.capacity:
+                    raise FileNotFoundError(f"Price bus for DataSourceSymbol {self.datasource_symbol_id} has been "
+                                            f"replaced by a new writer. Attach again to read from it.")
+
+                # The latest candle is always in the second half, so the latest size candles are contiguous.
+                count = int(header[_COUNT])
+                size = min(size_for(count), count, self.capacity)
+                end = (count - 1) % self.capacity + 1 + self.capacity if count > 0 else self.capacity
+                view = self.__data[end - size:end]
+
+                if int(header[_SEQUENCE]) == sequence:
+                    return count, view
+
+            # Write in progress. Yield to the writer and retry until timeout.
+            if deadline is None:
+                deadline = time.monotonic() + self.timeout
+            elif time.monotonic() > deadline:
+                raise TimeoutError(f"Price bus for DataSourceSymbol {self.datasource_symbol_id} has had a write in "
+                                   f"progress for over {self.timeout} seconds. The writer may have died.")
+            time.sleep(0)
+
+
+def _reuse(name: str, capacity: int, size: int) -> shared_memory.SharedMemory:
+    """
+    Attaches to a shared memory block left behind by a writer that did not close, e.g. because it crashed. The block is
+    replaced if it has a different capacity, marking it as replaced for any readers still attached to it.
+    :param name: The shared memory block name
+    :param capacity: The capacity of the ring buffer
+    :param size: The size of the block in bytes
+    :return: The shared memory block
+    :raises FileExistsError: If the writer that created the block is still running
+    """
+    shm = shared_memory.SharedMemory(name=name, create=False)
+    header = np.ndarray((_HEADER_SIZE,), dtype=np.int64, buffer=shm.buf)
+    pid = int(header[_PID])
+    if pid != 0 and _alive(pid):
+        # Stop the resource tracker from unlinking the other writers block when this process exits
+        del header
+        shm.close()
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        raise FileExistsError(f"Price bus {name} already has a writer in process {pid}.")
+
+    if int(header[_CAPACITY]) == capacity and shm.size >= size:
+        return shm
+
+    # Capacity 0 with an even sequence tells readers that the block has been replaced, even if the old writer died mid
+    # write.
+    header[_CAPACITY] = 0
+    header[_SEQUENCE] += 2 - header[_SEQUENCE] % 2
+    del header
+    shm.close()
+    shm.unlink()
+    return shared_memory.SharedMemory(name=name, create=True, size=size)
+
+
+def _alive(pid: int) -> bool:
+    """
+    Whether a process is running
+    :param pid: The process id
+    :return:
+    """
+    if os.name == 'nt':
+        # os.kill terminates the process on Windows, so query it instead
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return kernel32.GetLastError() == 5  # ERROR_ACCESS_DENIED. The process exists but belongs to another user.
+        exit_code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+        kernel32.CloseHandle(handle)
+        return exit_code.value == 259  # STILL_ACTIVE
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _views(shm: shared_memory.SharedMemory, capacity: int) -> (np.ndarray, np.ndarray):
+    """
+    Creates the header and data views onto a price bus shared memory block
+    :param shm: The shared memory block
+    :param capacity: The capacity of the ring buffer
+    :return: The header and data views
+    """
+    header = np.ndarray((_HEADER_SIZE,), dtype=np.int64, buffer=shm.buf)
+    data = np.ndarray((2 * capacity, len(COLUMNS)), dtype=np.float64, buffer=shm.buf,
+                      offset=_HEADER_SIZE * np.dtype(np.int64).itemsize)
+    return header, data
@@ -0,0 +1,184 @@
+"""
+A module for detecting data quality issues in candles and maintaining an index of them in the applications database.
+Issues detected are:
+    * gaps, ranges of missing candles;
+    * duplicates, more than one candle for the same time;
+    * spread, candles where the ask is not above the bid; and
+    * outliers, candles that jump away from and straight back to the prevailing price.
+
+Detection runs on chunks of newly written candles using a small number of preceding candles as context, so the full
+history never needs to be scanned. Sync.add_candles checks each chunk as it is written. Readers can skip the candles in
+known issues with DataQuality.get_candles.
+"""
+
+import numpy as np
+import pandas as pd
+
+import algotrader.config as cfg
+from algotrader.connections.db import Database
+
+# Issue types
+GAP = 'gap'
+DUPLICATE = 'duplicate'
+SPREAD = 'spread'
+OUTLIER = 'outlier'
+
+
+class DataQuality:
+    """
+    Detects, records and applies data quality issues for a DataSourceSymbol
+    """
+    @staticmethod
+    def check(database: Database, datasource_symbol_id: int, candles: pd.DataFrame,
+              written: bool = True) -> pd.DataFrame:
+        """
+        Detects issues in a chunk of candles and adds them to the databases data quality index. Issues already in the
+        index are not added again, so a chunk can be checked more than once. Gaps recorded within the time range of the
+        chunk are removed first, as the chunk fills them and any gaps remaining in it are detected again.
+        :param database: The database containing the candles and the data quality index
+        :param datasource_symbol_id: The DataSourceSymbol that the candles are for
+        :param candles: The new candles. Must include time, bid_open, bid_close, ask_open and ask_close columns.
+        :param written: Whether the candles have already been written to the database
+        :return: Dataframe of the issues found
+        """
+        if len(candles) == 0:
+            return pd.DataFrame(columns=['datasource_symbol_id', 'issue', 'from_time', 'to_time'])
+
+        window = cfg.Config().get('data_quality.outlier_window')
+        threshold = cfg.Config().get('data_quality.outlier_threshold')
+
+        # Candles preceding the chunk give the context for gaps and outliers at the start of the chunk. Candles stored
+        # at the time of the first candle are included so that duplicates across the boundary are found, except for
+        # the chunk's own candles if it has already been written.
+        first = int(candles['time'].min())
+        own = int((candles['time'] == first).sum()) if written else 0
+        context = database.get_candles(datasource_symbol_id, to_time=first + 1, limit=window + own)
+        if context is not None and own > 0:
+            at_first = np.flatnonzero(context['time'].to_numpy() == first)
+            context = context.drop(index=context.index[at_first[-own:]])
+
+        issues = DataQuality.detect(candles=candles, context=context, window=window, threshold=threshold)
+        issues.insert(0, 'datasource_symbol_id', datasource_symbol_id)
+
+        # Replace the gaps in the chunk and add any issues not already recorded
+        database.delete_data_quality_issues(datasource_symbol_id, first, int(candles['time'].max()), issue=GAP)
+        new_issues = issues
+        if len(issues) > 0:
+            existing = database.get_data_quality_issues(datasource_symbol_id, from_time=int(issues['from_time'].min()),
+                                                        to_time=int(issues['to_time'].max()))
+            if existing is not None and len(existing) > 0:
+                keys = ['issue', 'from_time', 'to_time']
+                merged = issues.merge(existing[keys].drop_duplicates(), on=keys, how='left', indicator=True)
+                new_issues = issues[(merged['_merge'] == 'left_only').to_numpy()]
+        database.add_data_quality_issues(new_issues)
+
+        return issues
+
+    @staticmethod
+    def get_candles(database: Database, datasource_symbol_id: int, from_time: int = None,
+                    to_time: int = None) -> pd.DataFrame:
+        """
+        Returns the candles for a DataSourceSymbol in a time range, excluding candles in any recorded data quality issue
+        :param database: The database containing the candles and the data quality index
+        :param datasource_symbol_id: The id of the DataSourceSymbol
+        :param from_time: Start of the time range, inclusive. Seconds since epoch. None for no start.
+        :param to_time: End of the time range, exclusive. Seconds since epoch. None for no end.
+        :return: Dataframe of candles ordered by time, or None if they could not be read
+        """
+        candles = database.get_candles(datasource_symbol_id, from_time=from_time, to_time=to_time)
+        if candles is None or len(candles) == 0:
+            return candles
+
+        issues = database.get_data_quality_issues(datasource_symbol_id, from_time=int(candles['time'].min()),
+                                                  to_time=int(candles['time'].max()))
+        if issues is None:
+            return None
+
+        return DataQuality.exclude(candles, issues)
+
+    @staticmethod
+    def detect(candles: pd.DataFrame, context: pd.DataFrame = None, window: int = 300,
+               threshold: float = 10) -> pd.DataFrame:
+        """
+        Detects issues in candles.
+        :param candles: The candles to check. Must include time, bid_open, bid_close, ask_open and ask_close columns.
+        :param context: Candles immediately preceding candles, if any. Issues are not reported for these except for an
+            outlier in the last context candle, which can only be confirmed by the candle after it.
+        :param window: Number of candles used to measure normal price movement for outlier detection
+        :param threshold: Number of standard deviations of normal price movement that a candle must jump away from and
+            back by to be an outlier
+        :return: Dataframe with columns issue, from_time and to_time
+        """
+        # Combine with context, flagging which rows issues can be reported for
+        data = candles.assign(_new=True)
+        if context is not None and len(context) > 0:
+            data = pd.concat([context.assign(_new=False), data], ignore_index=True)
+        data = data.sort_values('time', kind='stable', ignore_index=True)
+        times = data['time'].to_numpy(dtype=np.int64)
+        new = data['_new'].to_numpy(dtype=bool)
+
+        issues = []
+
+        # Duplicates. Any candle with the same time as the previous candle.
+        duplicate = np.zeros(len(data), dtype=bool)
+        duplicate[1:] = np.diff(times) == 0
+        issues.append(_ranges(DUPLICATE, times, duplicate & new))
+
+        # Gaps. The seconds between consecutive candles more than 1 second apart.
+        step = np.diff(times)
+        gap = np.flatnonzero((step > 1) & new[1:])
+        issues.append(pd.DataFrame({'issue': GAP, 'from_time': times[gap] + 1, 'to_time': times[gap + 1] - 1}))
+
+        # Spread. Ask is not above bid.
+        spread = ((data['ask_close'] <= data['bid_close']) | (data['ask_open'] <= data['bid_open'])).to_numpy()
+        issues.append(_ranges(SPREAD, times, spread & new))
+
+        # Outliers. The return into the candle and the return out of it are in opposite directions and both exceed
+        # threshold standard deviations of the returns preceding it.
+        mid = np.log((data['bid_close'].to_numpy(dtype=float) + data['ask_close'].to_numpy(dtype=float)) / 2)
+        returns = np.diff(mid, prepend=np.nan)
+        limit = threshold * pd.Series(returns).rolling(window, min_periods=2).std().shift(1).to_numpy()
+        jump = (np.abs(returns) > limit) & (limit > 0)
+        outlier = np.zeros(len(data), dtype=bool)
+        outlier[:-1] = jump[:-1] & jump[1:] & (np.sign(returns[:-1]) != np.sign(returns[1:]))
+        reportable = new.copy()
+        if not new.all():
+            reportable[np.flatnonzero(~new)[-1]] = True
+        issues.append(_ranges(OUTLIER, times, outlier & reportable))
+
+        return pd.concat(issues, ignore_index=True)
+
+    @staticmethod
+    def exclude(candles: pd.DataFrame, issues: pd.DataFrame) -> pd.DataFrame:
+        """
+        Removes candles that fall in the time range of any issue. Issues that have been fixed, such as backfilled gaps,
+        should first be removed with Database.delete_data_quality_issues.
+        :param candles: Candles with a time column
+        :param issues: Issues with from_time and to_time columns, e.g. from Database.get_data_quality_issues
+        :return: The candles that are not affected by any issue
+        """
+        if issues is None or len(issues) == 0:
+            return candles
+
+        # Count of issues open at each candle time. Ranges are inclusive so each closes at to_time + 1.
+        opens = np.sort(issues['from_time'].to_numpy(dtype=np.int64))
+        closes = np.sort(issues['to_time'].to_numpy(dtype=np.int64) + 1)
+        times = candles['time'].to_numpy(dtype=np.int64)
+        open_issues = np.searchsorted(opens, times, side='right') - np.searchsorted(closes, times, side='right')
+
+        return candles[open_issues == 0]
+
+
+def _ranges(issue: str, times: np.ndarray, mask: np.ndarray) -> pd.DataFrame:
+    """
+    Converts a mask of candles with an issue into time ranges, one per run of consecutive candles with the issue
+    :param issue: The issue type
+    :param times: Candle times
+    :param mask: Whether each candle has the issue
+    :return: Dataframe with columns issue, from_time and to_time
+    """
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) - 1
+
+    return pd.DataFrame({'issue': issue, 'from_time': times[starts], 'to_time': times[ends]})
@@ -1,19 +1,23 @@
 """
 A module for synchronising data between datasources and the applications database
 """
+import zlib
 from typing import List
 
 import pandas as pd
 
 from algotrader.connections.ds import DataSource
 from algotrader.connections.db import Database
+from algotrader.data.quality import DataQuality
+from algotrader.metrics import timed
 
 
 class Sync:
     """
-    Copies all symbols from all datasources to applications database
+    Copies all symbols from all datasources to applications database, and writes candles to it
     """
     @staticmethod
+    @timed('sync.sync_symbols', rows='return')
     def sync_symbols(datasources: List[DataSource], database: Database) -> pd.DataFrame:
         """
         Copies all symbols from specified datasources to the database where they don't already exist.
@@ -42,3 +46,38 @@ class Sync:
 
         return data
 
+    @staticmethod
+    @timed('sync.add_candles', rows='candles')
+    def add_candles(database: Database, candles: pd.DataFrame) -> pd.DataFrame:
+        """
+        Writes a chunk of new candles to the database, then checks the chunk for each DataSourceSymbol for data quality
+        issues, keeping the data quality index up to date as candles are written. Candles should be written through
+        here rather than with Database.add_candles.
+        :param database: The database to write to
+        :type database: Database
+        :param candles: Dataframe with columns datasource_symbol_id, time, bid and ask OHLC and volume
+        :return: Dataframe of the data quality issues found in the chunk
+        """
+        database.add_candles(candles)
+
+        issues = [pd.DataFrame(columns=['datasource_symbol_id', 'issue', 'from_time', 'to_time'])]
+        for datasource_symbol_id, symbol_candles in candles.groupby('datasource_symbol_id'):
+            issues.append(DataQuality.check(database, int(datasource_symbol_id), symbol_candles))
+
+        return pd.concat(issues, ignore_index=True)
+
+    @staticmethod
+    def shard_symbols(data: pd.DataFrame, shard: int, num_shards: int) -> pd.DataFrame:
+        """
+        Returns the symbols owned by a shard so that work for symbols can be spread across several instances of the
+        application. Each symbol is owned by exactly one shard. Ownership is decided by a hash of the datasource and
+        symbol names, which is the same in every process and does not change as symbols are added.
+        :param data: Dataframe of datasource symbols, as returned by sync_symbols
+        :param shard: The shard, from 0 to num_shards - 1
+        :param num_shards: The total number of shards
+        :return: The datasource symbols owned by the shard
+        """
+        keys = data['datasource_name'] + '.' + data['symbol_name']
+        owner = keys.map(lambda key: zlib.crc32(key.encode()) % num_shards)
+
+        return data[owner == shard]
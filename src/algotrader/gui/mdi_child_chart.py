@@ -0,0 +1,238 @@
+"""
+A real time price chart for a DataSourceSymbol.
+
+Price data is downsampled to the pixel width of the chart so that the number of points drawn does not depend on the
+length of the time range being viewed. Long time ranges are read from the databases rollups. New candles are read from
+the price bus on each refresh and merged into the lines, which are blitted over a cached background instead of
+redrawing the whole figure. While the view contains the latest candle it scrolls to follow new candles. See
+algotrader.data.chartdata for the data behind the chart.
+"""
+
+import logging
+import time
+from datetime import datetime
+
+import wx
+import wxconfig as cfg
+from matplotlib import cm
+from matplotlib.backends.backend_wxagg import FigureCanvasWxAgg as FigureCanvas
+from matplotlib.backends.backend_wxagg import NavigationToolbar2WxAgg as NavigationToolbar
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter
+
+from algotrader.data.chartdata import ChartData
+from algotrader.data.pricebus import PriceBusReader
+
+# The time range shown when the chart is first opened in seconds
+INITIAL_RANGE = 3600
+
+
+class MDIChildChart(wx.MDIChildFrame):
+    """
+    Shows a price chart of bid and ask for a DataSourceSymbol
+    """
+
+    datasource_symbol_id = None  # The DataSourceSymbol being charted
+
+    __log = None  # The logger
+    __database = None  # The applications database
+    __bus = None  # Reader for live candles. None if there is no live feed for this DataSourceSymbol.
+    __data = None  # The lines for the current view
+    __figure = None  # The matplotlib figure
+    __axes = None  # The axes for the price lines
+    __canvas = None  # The wx canvas the figure is drawn on
+    __bid_line = None  # Line for the bid price
+    __ask_line = None  # Line for the ask price
+    __background = None  # Cached render of the figure without the lines, used for blitting
+    __reload = True  # Whether the lines need to be reloaded for the current view
+
+    def __init__(self, parent, datasource_symbol_id):
+        # Super
+        wx.MDIChildFrame.__init__(self, parent=parent, id=wx.ID_ANY, pos=wx.DefaultPosition, title="Chart",
+                                  size=wx.Size(width=800, height=400),
+                                  style=wx.DEFAULT_FRAME_STYLE)
+
+        # Create logger
+        self.__log = logging.getLogger(__name__)
+
+        self.datasource_symbol_id = datasource_symbol_id
+        self.__database = parent.database
+
+        # Title from the datasource and symbol names
+        symbols = self.__database.get_datasource_symbols()
+        symbol = symbols[symbols['id'] == datasource_symbol_id].iloc[0]
+        self.SetTitle(f"Chart - {symbol['symbol_name']} ({symbol['datasource_name']})")
+
+        # Panel and sizer for chart
+        panel = wx.Panel(self, wx.ID_ANY)
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        panel.SetSizer(sizer)
+
+        # Figure, canvas and toolbar for panning and zooming
+        self.__figure = Figure()
+        self.__axes = self.__figure.add_subplot(111)
+        self.__axes.xaxis.set_major_formatter(FuncFormatter(
+            lambda x, pos: datetime.utcfromtimestamp(x).strftime('%Y-%m-%d\n%H:%M:%S')))
+        self.__canvas = FigureCanvas(panel, wx.ID_ANY, self.__figure)
+        toolbar = NavigationToolbar(self.__canvas)
+        toolbar.Realize()
+        sizer.Add(self.__canvas, 1, wx.ALL | wx.EXPAND)
+        sizer.Add(toolbar, 0, wx.LEFT | wx.EXPAND)
+
+        # Lines are animated so that they are excluded from full draws and can be blitted
+        colors = cm.get_cmap(cfg.Config().get('charts.colormap'))
+        self.__bid_line, = self.__axes.plot([], [], color=colors(0), label='Bid', animated=True)
+        self.__ask_line, = self.__axes.plot([], [], color=colors(1), label='Ask', animated=True)
+        self.__axes.legend(loc='upper left')
+
+        # Live candles from the price bus if there is a writer for this DataSourceSymbol
+        self.__attach()
+
+        # Reload when the view changes. Reload immediately when the user finishes panning or zooming, otherwise on
+        # the next refresh.
+        self.__axes.callbacks.connect('xlim_changed', self.__on_xlim_changed)
+        self.__canvas.mpl_connect('draw_event', self.__on_draw)
+        self.__canvas.mpl_connect('resize_event', self.__on_xlim_changed)
+        self.__canvas.mpl_connect('button_release_event', self.__on_view_changed)
+        self.__canvas.mpl_connect('scroll_event', self.__on_view_changed)
+        self.Bind(wx.EVT_CLOSE, self.__on_close, self)
+
+        # Show the most recent range
+        now = time.time()
+        self.__axes.set_xlim(now - INITIAL_RANGE, now)
+        self.__load()
+
+    def refresh(self):
+        """
+        Merges any new candles from the price bus into the chart, or reloads the chart if the view has changed. If the
+        view contained the latest candle and new candles go beyond the right of the view, scrolls to follow them.
+        Otherwise the view is left where the user put it.
+        :return:
+        """
+        if self.__reload:
+            self.__load()
+            return
+
+        # Merge new candles. Nothing to do if the writer has stalled.
+        following = self.__data.following
+        try:
+            changed = self.__data.update()
+        except TimeoutError as ex:
+            self.__log.debug(ex)
+            return
+        except FileNotFoundError as ex:
+            # Price bus replaced by a new writer. Attach to the new one and reload.
+            self.__log.debug(ex)
+            self.__attach()
+            self.__load()
+            return
+
+        # Scroll by half a view to follow new candles and reload
+        if following and self.__data.last_time is not None and self.__data.last_time > self.__data.end:
+            span = self.__data.end - self.__data.start
+            self.__axes.set_xlim(self.__data.last_time - span / 2, self.__data.last_time + span / 2)
+            self.__load()
+            return
+
+        if changed:
+            self.__set_lines()
+            self.__blit()
+
+    def __attach(self):
+        """
+        Attaches to the price bus for live candles if there is a writer for this DataSourceSymbol, detaching from any
+        previous price bus, and creates the chart data to read from it.
+        :return:
+        """
+        if self.__bus is not None:
+            self.__bus.close()
+            self.__bus = None
+
+        try:
+            self.__bus = PriceBusReader(self.datasource_symbol_id)
+        except FileNotFoundError:
+            self.__log.debug(f"No price bus for DataSourceSymbol {self.datasource_symbol_id}. Chart will not update "
+                             f"live.")
+        self.__data = ChartData(self.datasource_symbol_id, database=self.__database, bus=self.__bus)
+
+    def __load(self):
+        """
+        Loads the lines for the current view, downsampled to the width of the chart, then redraws the whole figure.
+        :return:
+        """
+        self.__reload = False
+
+        start, end = self.__axes.get_xlim()
+        self.__data.load(start, end, self.__pixel_width())
+        self.__set_lines()
+
+        # Rescale y to the data and redraw. Draw event caches the background and draws the lines.
+        self.__axes.relim()
+        self.__axes.autoscale_view(scalex=False)
+        self.__canvas.draw()
+
+    def __set_lines(self):
+        """
+        Sets the bid and ask lines from the chart data
+        :return:
+        """
+        self.__bid_line.set_data(*self.__data.lines['bid'])
+        self.__ask_line.set_data(*self.__data.lines['ask'])
+
+    def __pixel_width(self):
+        """
+        The width of the axes in pixels
+        :return:
+        """
+        return max(1, int(self.__axes.bbox.width))
+
+    def __blit(self):
+        """
+        Restores the cached background, draws the lines over it and blits the result to the screen.
+        :return:
+        """
+        if self.__background is None:
+            return
+
+        self.__canvas.restore_region(self.__background)
+        self.__axes.draw_artist(self.__bid_line)
+        self.__axes.draw_artist(self.__ask_line)
+        self.__canvas.blit(self.__axes.bbox)
+
+    def __on_draw(self, event):
+        """
+        Figure has been fully drawn. Cache the background and draw the lines over it.
+        :param event:
+        :return:
+        """
+        self.__background = self.__canvas.copy_from_bbox(self.__axes.bbox)
+        self.__axes.draw_artist(self.__bid_line)
+        self.__axes.draw_artist(self.__ask_line)
+
+    def __on_xlim_changed(self, event):
+        """
+        View has been panned, zoomed or resized. Lines will be reloaded.
+        :param event:
+        :return:
+        """
+        self.__reload = True
+
+    def __on_view_changed(self, event):
+        """
+        User has finished panning or zooming. Reload now if the view has changed.
+        :param event:
+        :return:
+        """
+        if self.__reload:
+            self.__load()
+
+    def __on_close(self, event):
+        """
+        Window closing. Detach from the price bus.
+        :param event:
+        :return:
+        """
+        if self.__bus is not None:
+            self.__bus.close()
+
+        event.Skip()
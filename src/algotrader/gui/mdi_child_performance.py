@@ -0,0 +1,101 @@
+"""
+Shows the applications performance metrics and provides switches for instrumentation and profiling
+"""
+
+import wx
+
+from algotrader.metrics import Metrics
+
+
+class MDIChildPerformance(wx.MDIChildFrame):
+    """
+    Shows the call count, latency and rows for each instrumented call and SQL statement
+    """
+
+    __columns = ['Kind', 'Call / Statement', 'Calls', 'Rows', 'Total (s)', 'Mean (ms)', 'Max (ms)']
+
+    __list = None  # List of metrics
+    __enabled = None  # Checkbox to turn instrumentation on and off
+    __profile = None  # Button to start and stop profiling
+
+    def __init__(self, parent):
+        # Super
+        wx.MDIChildFrame.__init__(self, parent=parent, id=wx.ID_ANY, pos=wx.DefaultPosition, title="Performance",
+                                  size=wx.Size(width=800, height=300),
+                                  style=wx.DEFAULT_FRAME_STYLE)
+
+        # Panel and sizer
+        panel = wx.Panel(self, wx.ID_ANY)
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        panel.SetSizer(sizer)
+
+        # Controls
+        controls_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.__enabled = wx.CheckBox(panel, wx.ID_ANY, "Instrumentation enabled")
+        self.__enabled.SetValue(Metrics.enabled)
+        self.Bind(wx.EVT_CHECKBOX, self.__on_enabled, self.__enabled)
+        controls_sizer.Add(self.__enabled, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+
+        reset = wx.Button(panel, wx.ID_ANY, "Reset")
+        self.Bind(wx.EVT_BUTTON, self.__on_reset, reset)
+        controls_sizer.Add(reset, 0, wx.ALL, 5)
+
+        self.__profile = wx.Button(panel, wx.ID_ANY, "")
+        self.Bind(wx.EVT_BUTTON, self.__on_profile, self.__profile)
+        controls_sizer.Add(self.__profile, 0, wx.ALL, 5)
+        sizer.Add(controls_sizer, 0, wx.ALL)
+
+        # Metrics list
+        self.__list = wx.ListCtrl(panel, wx.ID_ANY, style=wx.LC_REPORT | wx.LC_SINGLE_SEL)
+        for index, column in enumerate(self.__columns):
+            self.__list.InsertColumn(index, column, format=wx.LIST_FORMAT_LEFT if index < 2 else wx.LIST_FORMAT_RIGHT)
+        self.__list.SetColumnWidth(1, 300)
+        sizer.Add(self.__list, 1, wx.ALL | wx.EXPAND)
+
+        # Refresh to populate
+        self.refresh()
+
+    def refresh(self):
+        """
+        Refresh the metrics, slowest total first
+        :return:
+        """
+        stats = sorted(Metrics.stats(), key=lambda stat: stat['total'], reverse=True)
+
+        self.__list.Freeze()
+        self.__list.DeleteAllItems()
+        for stat in stats:
+            self.__list.Append([stat['kind'], stat['label'], str(stat['count']), str(stat['rows']),
+                                f"{stat['total']:.3f}", f"{stat['mean'] * 1000:.2f}", f"{stat['max'] * 1000:.2f}"])
+        self.__list.Thaw()
+
+        self.__profile.SetLabel("Stop Profiling" if Metrics.profiling() else "Start Profiling")
+
+    def __on_enabled(self, event):
+        """
+        Turn instrumentation on or off. Turning it on also starts the Prometheus server if a metrics port is configured.
+        :param event:
+        :return:
+        """
+        Metrics.set_enabled(self.__enabled.GetValue())
+
+    def __on_reset(self, event):
+        """
+        Clear the metrics
+        :param event:
+        :return:
+        """
+        Metrics.reset()
+        self.refresh()
+
+    def __on_profile(self, event):
+        """
+        Start or stop profiling
+        :param event:
+        :return:
+        """
+        if Metrics.profiling():
+            Metrics.stop_profiling()
+        else:
+            Metrics.start_profiling()
+        self.refresh()
@@ -4,12 +4,14 @@ The MDI Frame for the application and a FrameManager which handles the opening a
 
 import importlib
 import logging
+import time
 import wx
 import wxconfig as cfg
 from secrets import secrets
 from algotrader.connections.db import Database
 from algotrader.connections.ds import DataSource
 from algotrader.data.sync import Sync
+from algotrader.metrics import Metrics, timed
 
 
 class MDIFrame(wx.MDIParentFrame):
@@ -52,12 +54,16 @@ class MDIFrame(wx.MDIParentFrame):
         data_menu = wx.Menu()
         self.Bind(wx.EVT_MENU, self.on_data_symbols,
                   data_menu.Append(wx.ID_ANY, "&Symbols", "Sync application symbols from data sources and edit"))
+        self.Bind(wx.EVT_MENU, self.__on_data_chart,
+                  data_menu.Append(wx.ID_ANY, "&Chart", "Open a price chart for a symbol"))
         menubar.Append(data_menu, "&Data")
 
         # Create help menu
         help_menu = wx.Menu()
         self.Bind(wx.EVT_MENU, self.__on_view_log,
                   help_menu.Append(wx.ID_ANY, "View Log", "Show application log."))
+        self.Bind(wx.EVT_MENU, self.__on_view_performance,
+                  help_menu.Append(wx.ID_ANY, "Performance", "Show application performance metrics."))
         self.Bind(wx.EVT_MENU, self.__on_view_help,
                   help_menu.Append(wx.ID_ANY, "Help", "Show application usage instructions."))
         menubar.Append(help_menu, "&Help")
@@ -73,6 +79,14 @@ class MDIFrame(wx.MDIParentFrame):
         # Connect to database
         self.__connect()
 
+    @property
+    def database(self):
+        """
+        This applications database. Used by child frames that need to read data.
+        :return:
+        """
+        return self.__database
+
     def __connect(self):
         """
         Connects to database and data sources
@@ -135,6 +149,25 @@ class MDIFrame(wx.MDIParentFrame):
 
         # TODO Edit frame
 
+    def __on_data_chart(self, evt):
+        """
+        Select a symbol and open a chart for it
+        :param evt:
+        :return:
+        """
+        # Symbols that price data is retrieved for
+        symbols = self.__database.get_datasource_symbols()
+        symbols = symbols[symbols['retrieve_price_data'].astype(bool)]
+        choices = [f"{row['symbol_name']} ({row['datasource_name']})" for _, row in symbols.iterrows()]
+
+        dialog = wx.SingleChoiceDialog(self, "Select a symbol to chart", "Chart", choices)
+        if dialog.ShowModal() == wx.ID_OK:
+            datasource_symbol_id = int(symbols.iloc[dialog.GetSelection()]['id'])
+            FrameManager.open_frame(parent=self, frame_module='algotrader.gui.mdi_child_chart',
+                                    frame_class='MDIChildChart', raise_if_open=True,
+                                    datasource_symbol_id=datasource_symbol_id)
+        dialog.Destroy()
+
     def __on_exit(self, evt):
         # Close
         self.Close()
@@ -166,6 +199,15 @@ class MDIFrame(wx.MDIParentFrame):
         FrameManager.open_frame(parent=self, frame_module='algotrader.gui.mdi_child_util',
                                 frame_class='MDIChildLog', raise_if_open=True)
 
+    def __on_view_performance(self, evt):
+        """
+        View the performance metrics
+        :return:
+        """
+        FrameManager.open_frame(parent=self, frame_module='algotrader.gui.mdi_child_performance',
+                                frame_class='MDIChildPerformance', raise_if_open=True)
+
+    @timed('gui.refresh')
     def __refresh(self, evt):
         """
         Refreshes all open child windows that have implemented a refresh method. Called on timer.
@@ -177,7 +219,12 @@ class MDIFrame(wx.MDIParentFrame):
         for child in children:
             # check if child has refresh method
             if getattr(child, 'refresh', None) is not None and callable(getattr(child, 'refresh')):
-                child.refresh()
+                if Metrics.enabled:
+                    start = time.perf_counter()
+                    child.refresh()
+                    Metrics.record('call', f'gui.refresh.{type(child).__name__}', time.perf_counter() - start)
+                else:
+                    child.refresh()
 
 
 class FrameManager:
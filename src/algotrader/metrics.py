@@ -0,0 +1,310 @@
+"""
+Instrumentation for the applications hot paths. Records the call count, latency and row counts of instrumented
+functions and of every SQL statement, exports them in the Prometheus text format on a local port, and provides a switch
+to profile the application with cProfile.
+
+Instrumentation is off unless metrics.enabled is set in config. When off, an instrumented call costs one attribute
+check.
+"""
+
+import atexit
+import bisect
+import cProfile
+import functools
+import inspect
+import logging
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sqlalchemy import event
+
+import algotrader.config as cfg
+
+# Upper bounds of the latency histogram buckets in seconds
+BUCKETS = [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10]
+
+# Prometheus metric name, label name and help text for each kind of metric
+KINDS = {
+    'call': ('algotrader_call', 'call', "Instrumented application calls."),
+    'sql': ('algotrader_sql', 'statement', "SQL statements executed against the database."),
+}
+
+# Statement type and table of an SQL statement, used to label SQL metrics. UPDATE is followed directly by its table.
+# Other statements name their table after FROM, INTO, TABLE or ON.
+_STATEMENT = re.compile(r'^\s*(?:(UPDATE)\s+"?(\w+)|(\w+).*?\b(?:FROM|INTO|TABLE|ON)\s+"?(\w+))',
+                        re.IGNORECASE | re.DOTALL)
+
+
+class Metrics:
+    """
+    Collects metrics and exports them. All methods are static as metrics are collected for the whole application.
+    """
+
+    enabled = False  # Whether metrics are being recorded
+
+    __log = logging.getLogger(__name__)
+    __lock = threading.Lock()  # Protects stats, which are recorded from several threads
+    __stats = {}  # _Stat by kind and label
+    __server = None  # Prometheus HTTP server
+    __profiler = None  # cProfile profiler, if profiling
+
+    @staticmethod
+    def configure() -> None:
+        """
+        Configures metrics from the applications config. Starts the Prometheus server and profiler if configured.
+        :return:
+        """
+        Metrics.set_enabled(bool(cfg.Config().get('metrics.enabled')))
+
+        if cfg.Config().get('metrics.profile'):
+            Metrics.start_profiling()
+            atexit.register(Metrics.stop_profiling)
+
+    @staticmethod
+    def set_enabled(enabled: bool) -> None:
+        """
+        Turns recording on or off. When turning on, also starts the Prometheus server if a metrics.port is configured.
+        The server keeps running when recording is turned off and serves the metrics recorded so far.
+        :param enabled: Whether to record metrics
+        :return:
+        """
+        Metrics.enabled = enabled
+
+        port = cfg.Config().get('metrics.port')
+        if enabled and port:
+            Metrics.start_server(port)
+
+    @staticmethod
+    def record(kind: str, label: str, seconds: float, rows: int = None) -> None:
+        """
+        Records a single call
+        :param kind: The kind of metric. A key of KINDS.
+        :param label: The call or statement
+        :param seconds: The duration of the call
+        :param rows: The number of rows read or written, if known
+        :return:
+        """
+        with Metrics.__lock:
+            stat = Metrics.__stats.get((kind, label))
+            if stat is None:
+                stat = Metrics.__stats[(kind, label)] = _Stat()
+            stat.add(seconds, rows)
+
+    @staticmethod
+    def stats() -> list:
+        """
+        Returns a snapshot of all recorded metrics
+        :return: List of dicts with kind, label, count, rows, total, mean and max. Times are in seconds.
+        """
+        with Metrics.__lock:
+            return [{'kind': kind, 'label': label, 'count': stat.count, 'rows': stat.rows, 'total': stat.total,
+                     'mean': stat.total / stat.count, 'max': stat.max}
+                    for (kind, label), stat in Metrics.__stats.items()]
+
+    @staticmethod
+    def reset() -> None:
+        """
+        Clears all recorded metrics
+        :return:
+        """
+        with Metrics.__lock:
+            Metrics.__stats = {}
+
+    @staticmethod
+    def prometheus() -> str:
+        """
+        Returns all recorded metrics in the Prometheus text exposition format
+        :return:
+        """
+        with Metrics.__lock:
+            stats = sorted(Metrics.__stats.items())
+
+        lines = []
+        for kind, (name, label_name, help_text) in KINDS.items():
+            kind_stats = [(label, stat) for (stat_kind, label), stat in stats if stat_kind == kind]
+
+            lines.append(f"# HELP {name}_duration_seconds {help_text} Duration in seconds.")
+            lines.append(f"# TYPE {name}_duration_seconds histogram")
+            for label, stat in kind_stats:
+                labels = f'{label_name}="{_escape(label)}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS, stat.buckets):
+                    cumulative += count
+                    lines.append(f'{name}_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_duration_seconds_bucket{{{labels},le="+Inf"}} {stat.count}')
+                lines.append(f'{name}_duration_seconds_sum{{{labels}}} {stat.total}')
+                lines.append(f'{name}_duration_seconds_count{{{labels}}} {stat.count}')
+
+            lines.append(f"# HELP {name}_rows_total {help_text} Rows read or written.")
+            lines.append(f"# TYPE {name}_rows_total counter")
+            for label, stat in kind_stats:
+                lines.append(f'{name}_rows_total{{{label_name}="{_escape(label)}"}} {stat.rows}')
+
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def start_server(port: int) -> None:
+        """
+        Serves metrics in the Prometheus text format at http://127.0.0.1:port/metrics
+        :param port: The port to serve on
+        :return:
+        """
+        if Metrics.__server is None:
+            try:
+                Metrics.__server = ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+            except OSError as ex:
+                Metrics.__log.warning(f"Could not start metrics server on port {port}. {ex}")
+                return
+
+            threading.Thread(target=Metrics.__server.serve_forever, name='metrics-server', daemon=True).start()
+            Metrics.__log.info(f"Serving metrics at http://127.0.0.1:{port}/metrics")
+
+    @staticmethod
+    def profiling() -> bool:
+        """
+        Whether the profiler is running
+        :return:
+        """
+        return Metrics.__profiler is not None
+
+    @staticmethod
+    def start_profiling() -> None:
+        """
+        Starts profiling the calling thread with cProfile. For sampling the whole process without the overhead of
+        cProfile, attach py-spy to the applications pid instead.
+        :return:
+        """
+        if Metrics.__profiler is None:
+            Metrics.__profiler = cProfile.Profile()
+            Metrics.__profiler.enable()
+            Metrics.__log.info("Profiling started.")
+
+    @staticmethod
+    def stop_profiling() -> None:
+        """
+        Stops profiling and writes the profile to the configured metrics.profile_file. The profile can be read with
+        pstats or tools such as snakeviz.
+        :return:
+        """
+        if Metrics.__profiler is not None:
+            Metrics.__profiler.disable()
+            profile_file = cfg.Config().get('metrics.profile_file')
+            Metrics.__profiler.dump_stats(profile_file)
+            Metrics.__profiler = None
+            Metrics.__log.info(f"Profiling stopped. Profile written to {profile_file}.")
+
+    @staticmethod
+    def instrument_engine(engine) -> None:
+        """
+        Records the latency and row count of every SQL statement executed by an SQLAlchemy engine. The start time is
+        kept on the statements execution context, so a statement that raises is not recorded and leaves nothing behind.
+        :param engine: The engine
+        :return:
+        """
+        @event.listens_for(engine, 'before_cursor_execute')
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if Metrics.enabled and context is not None:
+                context.metrics_start = time.perf_counter()
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            start = getattr(context, 'metrics_start', None)
+            if start is not None and Metrics.enabled:
+                context.metrics_start = None
+                seconds = time.perf_counter() - start
+                match = _STATEMENT.match(statement)
+                if match:
+                    # Only the groups of the alternative that matched are set
+                    verb, table = [group for group in match.groups() if group is not None]
+                    label = f"{verb.upper()} {table}"
+                else:
+                    label = statement.split(None, 1)[0].upper()
+                rows = cursor.rowcount if cursor.rowcount >= 0 else None
+                Metrics.record('sql', label, seconds, rows)
+
+
+def timed(name: str, rows: str = None):
+    """
+    Decorator that records the latency of calls to the decorated function when metrics are enabled.
+    :param name: The label to record calls under
+    :param rows: How to count rows. 'return' for the length of the return value, or the name of a parameter to use
+        the length of that parameter. None to not count rows.
+    :return:
+    """
+    def decorator(func):
+        signature = inspect.signature(func) if rows not in (None, 'return') else None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not Metrics.enabled:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            seconds = time.perf_counter() - start
+
+            count = None
+            if rows == 'return':
+                count = len(result) if result is not None else 0
+            elif rows is not None:
+                count = len(signature.bind(*args, **kwargs).arguments[rows])
+            Metrics.record('call', name, seconds, count)
+
+            return result
+        return wrapper
+    return decorator
+
+
+class _Stat:
+    """
+    Statistics for a single call or statement
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.rows = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)  # Non cumulative count per bucket. Calls over the last bound are not counted.
+
+    def add(self, seconds, rows):
+        self.count += 1
+        self.rows += rows if rows is not None else 0
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        bucket = bisect.bisect_left(BUCKETS, seconds)
+        if bucket < len(BUCKETS):
+            self.buckets[bucket] += 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Serves the Prometheus metrics
+    """
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+
+        body = Metrics.prometheus().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Don't write every scrape to stderr
+        pass
+
+
+def _escape(value: str) -> str:
+    """
+    Escapes a Prometheus label value
+    :param value:
+    :return:
+    """
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -1,11 +1,14 @@
 """
 The base datamodel for collecting price candles including Symbol and Candle
 """
-from sqlalchemy import Column, Integer, String, Boolean, BigInteger, Numeric, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, BigInteger, Numeric, ForeignKey, Index
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
 
+# The bucket sizes in seconds that candles are rolled up into as they are written. See CandleRollup.
+ROLLUP_INTERVALS = [60, 3600, 86400]
+
 
 class DataSource(Base):
     """
@@ -60,11 +63,18 @@ class Candle(Base):
     """
     __tablename__ = 'candle'
 
-    id = Column(BigInteger, primary_key=True)
+    # Candles are read by symbol and time range
+    __table_args__ = (Index('ix_candle_datasource_symbol_id_time', 'datasource_symbol_id', 'time'),)
+
+    # SQLite only autoincrements integer primary keys
+    id = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True)
 
     # The datasource that this was retrieved from and the symbol that it is for
     datasource_symbol_id = Column(Integer, ForeignKey('datasource_symbol.id'))
 
+    # Candle open time in seconds since epoch (UTC)
+    time = Column(BigInteger)
+
     # OHLC columns for bid and ask
     bid_open = Column(Numeric(12, 6))
     bid_high = Column(Numeric(12, 6))
@@ -79,9 +89,75 @@ class Candle(Base):
     volume = Column(Integer)
 
     def __repr__(self):
-        return f"Candle(id={self.id}, datasource_symbol_id={self.datasource_symbol_id}, " \
+        return f"Candle(id={self.id}, datasource_symbol_id={self.datasource_symbol_id}, time={self.time}, " \
                f"bid_open={self.bid_open}, bid_high={self.bid_high}, bid_low={self.bid_low}, " \
                f"bid_close={self.bid_close}, ask_open={self.ask_open}, ask_high={self.ask_high}, " \
                f"ask_low={self.ask_low}, ask_close={self.ask_close}, volume={self.volume})"
 
 
+class CandleRollup(Base):
+    """
+    The bid and ask range and volume of the Candles for a DataSourceSymbol aggregated into buckets of interval seconds.
+    Maintained as candles are written so that long time ranges can be read at a coarser resolution without aggregating
+    the 1 second candles on every read.
+    """
+    __tablename__ = 'candle_rollup'
+
+    # Rollups are read by symbol, interval and time range. There is one rollup per bucket.
+    __table_args__ = (Index('ix_candle_rollup_datasource_symbol_id_interval_time', 'datasource_symbol_id', 'interval',
+                            'time', unique=True),)
+
+    # SQLite only autoincrements integer primary keys
+    id = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True)
+
+    # The datasource and symbol that the candles are for
+    datasource_symbol_id = Column(Integer, ForeignKey('datasource_symbol.id'))
+
+    # Bucket size in seconds. One of ROLLUP_INTERVALS.
+    interval = Column(Integer)
+
+    # Bucket start time in seconds since epoch (UTC)
+    time = Column(BigInteger)
+
+    # Range of bid and ask across the candles in the bucket
+    bid_low = Column(Numeric(12, 6))
+    bid_high = Column(Numeric(12, 6))
+    ask_low = Column(Numeric(12, 6))
+    ask_high = Column(Numeric(12, 6))
+
+    # Volume of ticks that made up the candles in the bucket
+    volume = Column(BigInteger)
+
+    def __repr__(self):
+        return f"CandleRollup(id={self.id}, datasource_symbol_id={self.datasource_symbol_id}, " \
+               f"interval={self.interval}, time={self.time}, bid_low={self.bid_low}, bid_high={self.bid_high}, " \
+               f"ask_low={self.ask_low}, ask_high={self.ask_high}, volume={self.volume})"
+
+
+class DataQualityIssue(Base):
+    """
+    A time range of candles for a DataSourceSymbol with a data quality issue. Together these form an index of known gaps
+    and bad data that can be used to backfill missing candles or to skip bad ones.
+    """
+    __tablename__ = 'data_quality_issue'
+
+    # Issues are read by symbol and time range
+    __table_args__ = (Index('ix_data_quality_issue_datasource_symbol_id_from_time', 'datasource_symbol_id',
+                            'from_time'),)
+
+    # SQLite only autoincrements integer primary keys
+    id = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True)
+
+    # The datasource and symbol that the issue is for
+    datasource_symbol_id = Column(Integer, ForeignKey('datasource_symbol.id'))
+
+    # The type of issue. One of gap, duplicate, spread or outlier. See algotrader.data.quality.
+    issue = Column(String(20))
+
+    # The time range of the issue in seconds since epoch (UTC), inclusive. For gaps this is the range of missing candles.
+    from_time = Column(BigInteger)
+    to_time = Column(BigInteger)
+
+    def __repr__(self):
+        return f"DataQualityIssue(id={self.id}, datasource_symbol_id={self.datasource_symbol_id}, " \
+               f"issue={self.issue}, from_time={self.from_time}, to_time={self.to_time})"
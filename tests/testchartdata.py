@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import definitions
+import algotrader.config as cfg
+import algotrader.data.pricebus as pb
+from algotrader.connections.db import Database
+from algotrader.data.chartdata import ChartData
+
+
+class TestChartData(unittest.TestCase):
+    def setUp(self) -> None:
+        # A price bus with a writer, and chart data for a day viewed at 100 pixels wide
+        self.writer = pb.PriceBusWriter(datasource_symbol_id=-3, capacity=10000)
+        self.reader = pb.PriceBusReader(datasource_symbol_id=-3)
+        self.data = ChartData(datasource_symbol_id=-3, bus=self.reader)
+
+    def tearDown(self) -> None:
+        self.reader.close()
+        self.writer.close()
+
+    @staticmethod
+    def candles(start, end):
+        # Candles with a random walk price
+        rng = np.random.default_rng(start)
+        candles = np.zeros((end - start, len(pb.COLUMNS)))
+        candles[:, 0] = np.arange(start, end)
+        candles[:, 1:9] = (1.2 + np.cumsum(rng.normal(scale=0.0001, size=end - start)))[:, None]
+        return candles
+
+    def test_update(self):
+        # Candles arriving one at a time should be merged into the pixels already drawn
+        self.data.load(0, 86400, 100)
+        for candle in self.candles(0, 5000):
+            self.writer.append(candle)
+            self.data.update()
+
+        x, y = self.data.lines['bid']
+        self.assertTrue(len(x) <= 2 * 100, "There should be at most 2 points per pixel.")
+        self.assertTrue(np.all(np.diff(x) >= 0), "Points should be in time order.")
+
+        # Same points as loading the candles in one go
+        self.data.load(0, 86400, 100)
+        self.assertTrue(np.array_equal(self.data.lines['bid'][0], x))
+
+    def test_view(self):
+        # Only candles in the view are charted. The view follows while it contains the latest candle.
+        self.writer.append(self.candles(0, 100))
+        self.data.load(0, 50, 100)
+        self.assertEqual(self.data.lines['ask'][0].max(), 50, "Candles after the view should not be charted.")
+        self.assertFalse(self.data.following, "View does not contain the latest candle.")
+
+        self.data.load(50, 150, 100)
+        self.assertTrue(self.data.following, "View contains the latest candle.")
+        self.writer.append(self.candles(100, 200))
+        self.assertTrue(self.data.update())
+        self.assertEqual(self.data.last_time, 199)
+        self.assertEqual(self.data.lines['ask'][0].max(), 150, "Candles after the view should not be charted.")
+
+    def test_load_rollup(self):
+        # A zoomed out view should be filled up to its left edge by the bucket containing it
+        cfg.Config().load(os.path.join(definitions.ROOT_DIR, 'tests', 'testconfig.yaml'))
+        with tempfile.TemporaryDirectory() as directory:
+            database = Database('sqlite', '', os.path.join(directory, 'test.db'), '', '')
+            database.add_candles(pd.DataFrame(self.candles(900, 5000), columns=pb.COLUMNS)
+                                 .astype({'time': int}).assign(datasource_symbol_id=-3))
+
+            data = ChartData(datasource_symbol_id=-3, database=database)
+            data.load(1000, 4600, 60)
+            self.assertEqual(data.lines['bid'][0].min(), 960, "Bucket containing the start of the view should be read.")
@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+
+from algotrader.data import downsample
+
+
+class TestDownsample(unittest.TestCase):
+    def setUp(self) -> None:
+        # A noisy series with a single spike up and down
+        rng = np.random.default_rng(0)
+        self.x = np.arange(100000, dtype=np.float64)
+        self.y = np.sin(self.x / 1000) + rng.normal(scale=0.01, size=len(self.x))
+        self.y[5000] = 10
+        self.y[7000] = -10
+
+    def test_minmax(self):
+        x, y = downsample.minmax(self.x, self.y, 500)
+
+        self.assertTrue(len(x) <= 1000, "There should be at most 2 points per bucket.")
+        self.assertTrue(np.all(np.diff(x) >= 0), "Points should be in x order.")
+        self.assertIn(10, y, "Maximum should be preserved.")
+        self.assertIn(-10, y, "Minimum should be preserved.")
+
+    def test_minmax_small(self):
+        # Series that already fit the buckets should be returned unchanged
+        x, y = downsample.minmax(self.x[:10], self.y[:10], 500)
+        self.assertEqual(len(x), 10)
+
+    def test_lttb(self):
+        x, y = downsample.lttb(self.x, self.y, 500)
+
+        self.assertEqual(len(x), 500, "Should return threshold points.")
+        self.assertEqual(x[0], self.x[0], "First point should be kept.")
+        self.assertEqual(x[-1], self.x[-1], "Last point should be kept.")
+        self.assertTrue(np.all(np.diff(x) > 0), "Points should be in x order.")
+        self.assertIn(10, y, "Spike should be preserved.")
+
+    def test_minmax_grid(self):
+        x, y = downsample.minmax_grid(self.x, self.y, 0, 200)
+
+        self.assertTrue(len(x) <= 1000, "There should be at most 2 points per bucket.")
+        self.assertIn(10, y, "Maximum should be preserved.")
+        self.assertIn(-10, y, "Minimum should be preserved.")
+
+        # Downsampling the last bucket again with new points should give the same result as downsampling them all
+        tail = np.searchsorted(x, 99800)
+        new_x, new_y = np.arange(100000, 100500, dtype=np.float64), np.zeros(500)
+        merged = downsample.minmax_grid(np.concatenate((x[tail:], new_x)), np.concatenate((y[tail:], new_y)), 0, 200)
+        whole = downsample.minmax_grid(np.concatenate((self.x, new_x)), np.concatenate((self.y, new_y)), 0, 200)
+        self.assertTrue(np.array_equal(np.concatenate((x[:tail], merged[0])), whole[0]))
@@ -0,0 +1,75 @@
+import unittest
+
+from sqlalchemy import create_engine, exc, text
+
+from algotrader.metrics import Metrics, timed
+
+
+@timed('test.rows_from_return', rows='return')
+def rows_from_return(n):
+    return list(range(n))
+
+
+@timed('test.rows_from_param', rows='data')
+def rows_from_param(name, data):
+    pass
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self) -> None:
+        Metrics.reset()
+        Metrics.enabled = True
+
+    def tearDown(self) -> None:
+        Metrics.enabled = False
+        Metrics.reset()
+
+    def stat(self, label):
+        # The stat for a label, or None if there is none
+        return next((stat for stat in Metrics.stats() if stat['label'] == label), None)
+
+    def test_timed(self):
+        rows_from_return(3)
+        rows_from_return(4)
+        rows_from_param('test', data=[1, 2])
+
+        stat = self.stat('test.rows_from_return')
+        self.assertEqual(stat['count'], 2, "Both calls should be recorded.")
+        self.assertEqual(stat['rows'], 7, "Rows should be the total length of the returned lists.")
+        self.assertEqual(self.stat('test.rows_from_param')['rows'], 2, "Rows should be the length of data.")
+
+    def test_disabled(self):
+        Metrics.enabled = False
+        self.assertEqual(rows_from_return(3), [0, 1, 2], "Decorated function should still return its result.")
+        self.assertIsNone(self.stat('test.rows_from_return'), "Nothing should be recorded when disabled.")
+
+    def test_prometheus(self):
+        Metrics.record('sql', 'SELECT candle', 0.002, 10)
+        Metrics.record('sql', 'SELECT candle', 20, 5)
+        text = Metrics.prometheus()
+
+        self.assertIn('# TYPE algotrader_sql_duration_seconds histogram', text)
+        self.assertIn('algotrader_sql_duration_seconds_bucket{statement="SELECT candle",le="0.001"} 0', text)
+        self.assertIn('algotrader_sql_duration_seconds_bucket{statement="SELECT candle",le="0.005"} 1', text)
+        self.assertIn('algotrader_sql_duration_seconds_bucket{statement="SELECT candle",le="+Inf"} 2', text)
+        self.assertIn('algotrader_sql_duration_seconds_count{statement="SELECT candle"} 2', text)
+        self.assertIn('algotrader_sql_rows_total{statement="SELECT candle"} 15', text)
+
+    def test_sql(self):
+        engine = create_engine('sqlite://')
+        Metrics.instrument_engine(engine)
+        with engine.connect() as con:
+            con.execute(text("CREATE TABLE candle (time INTEGER)"))
+            con.execute(text("INSERT INTO candle (time) VALUES (1), (2)"))
+            self.assertEqual(self.stat('INSERT candle')['rows'], 2, "Rows should be the number of rows inserted.")
+            con.execute(text("UPDATE candle SET time = time + 1 WHERE time = 1"))
+            self.assertEqual(self.stat('UPDATE candle')['rows'], 1, "UPDATE should be labelled with its table.")
+
+            # A failed statement should not be recorded, or leave its start time to be recorded by a later statement
+            with self.assertRaises(exc.OperationalError):
+                con.execute(text("SELECT * FROM missing"))
+            Metrics.enabled = False
+            con.execute(text("SELECT * FROM candle"))
+
+        self.assertIsNone(self.stat('SELECT missing'), "Failed statement should not be recorded.")
+        self.assertIsNone(self.stat('SELECT candle'), "Nothing should be recorded when disabled.")
@@ -0,0 +1,167 @@
+import multiprocessing
+import os
+import unittest
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import algotrader.data.pricebus as pb
+
+
+def read_latest(datasource_symbol_id, n, queue):
+    # Reads the latest candle times from the bus in a child process
+    reader = pb.PriceBusReader(datasource_symbol_id=datasource_symbol_id)
+    count, view = reader.latest(n)
+    queue.put((count, view[:, 0].tolist()))
+    reader.close()
+
+
+def write_and_die(datasource_symbol_id, capacity):
+    # Writes candles to the bus in a child process then exits without closing the writer, as if it had crashed
+    writer = pb.PriceBusWriter(datasource_symbol_id=datasource_symbol_id, capacity=capacity)
+    writer.append(np.ones((2, len(pb.COLUMNS))))
+    os._exit(0)
+
+
+class TestPriceBus(unittest.TestCase):
+    __capacity = 5
+
+    def setUp(self) -> None:
+        # Create the bus and attach a reader
+        self.writer = pb.PriceBusWriter(datasource_symbol_id=-1, capacity=self.__capacity)
+        self.reader = pb.PriceBusReader(datasource_symbol_id=-1)
+
+    def tearDown(self) -> None:
+        self.reader.close()
+        self.writer.close()
+
+    @staticmethod
+    def candles(start, end):
+        # Candles where every column holds the candles time
+        return np.repeat(np.arange(start, end, dtype=np.float64)[:, None], len(pb.COLUMNS), axis=1)
+
+    def test_latest(self):
+        # Nothing written
+        count, view = self.reader.latest(3)
+        self.assertEqual(count, 0, "No candles have been written.")
+        self.assertEqual(len(view), 0, "View should be empty when no candles have been written.")
+
+        # Write more than capacity so that the ring buffer wraps and check that the latest are returned in order
+        self.writer.append(self.candles(0, 4))
+        self.writer.append(self.candles(4, 8))
+        count, view = self.reader.latest(3)
+        self.assertEqual(count, 8, "8 candles have been written.")
+        self.assertTrue(np.array_equal(view[:, 0], [5, 6, 7]), "Latest 3 candles should be 5, 6 and 7.")
+
+        count, view = self.reader.latest(self.__capacity)
+        self.assertTrue(np.array_equal(view[:, 0], [3, 4, 5, 6, 7]), "Full view should be contiguous after wrap.")
+
+    def test_latest_is_view(self):
+        # Views should see subsequent writes to the same slots, proving that they are not copies
+        self.writer.append(self.candles(0, 2))
+        count, view = self.reader.latest(1)
+        self.assertFalse(view.flags.writeable, "Reader views should be read only.")
+        self.assertEqual(view[0, 0], 1)
+
+        self.writer.append(self.candles(2, 2 + self.__capacity))
+        self.assertFalse(self.reader.is_valid(count, 1), "View should be invalid once its slot is overwritten.")
+        self.assertNotEqual(view[0, 0], 1, "View should share memory with the bus.")
+
+    def test_since(self):
+        # Only candles written since count should be returned
+        count, _ = self.reader.latest(0)
+        self.writer.append(self.candles(0, 2))
+        count, view = self.reader.since(count)
+        self.assertTrue(np.array_equal(view[:, 0], [0, 1]))
+
+        self.writer.append(self.candles(2, 3))
+        count, view = self.reader.since(count)
+        self.assertEqual(count, 3)
+        self.assertTrue(np.array_equal(view[:, 0], [2]))
+
+        # More than capacity since count should return only the latest capacity candles
+        self.writer.append(self.candles(3, 20))
+        count, view = self.reader.since(count)
+        self.assertEqual(len(view), self.__capacity)
+        self.assertEqual(view[-1, 0], 19)
+
+    def test_other_process(self):
+        # A reader in another process should see the candles written by this process
+        self.writer.append(self.candles(0, 8))
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=read_latest, args=(-1, 3, queue))
+        process.start()
+        count, times = queue.get(timeout=30)
+        process.join()
+
+        self.assertEqual(count, 8, "Reader in other process should see 8 candles written.")
+        self.assertEqual(times, [5, 6, 7], "Reader in other process should see the latest candles.")
+
+    def test_stalled_write(self):
+        # Leave the sequence odd as if the writer died mid write. Reads should time out rather than wait forever.
+        shm = shared_memory.SharedMemory(name=pb.shared_memory_name(-1), create=False)
+        header = np.ndarray((pb._HEADER_SIZE,), dtype=np.int64, buffer=shm.buf)
+        header[pb._SEQUENCE] += 1
+        reader = pb.PriceBusReader(datasource_symbol_id=-1, timeout=0.01)
+        with self.assertRaises(TimeoutError):
+            reader.since(0)
+        header[pb._SEQUENCE] += 1
+        reader.close()
+        del header
+        shm.close()
+
+    def test_restart(self):
+        # A writer that died without closing should not stop a new writer from starting
+        process = multiprocessing.Process(target=write_and_die, args=(-2, self.__capacity))
+        process.start()
+        process.join()
+
+        writer = pb.PriceBusWriter(datasource_symbol_id=-2, capacity=self.__capacity)
+        try:
+            reader = pb.PriceBusReader(datasource_symbol_id=-2)
+            self.assertEqual(reader.count, 0, "New writer should reset the bus.")
+            writer.append(self.candles(0, 1))
+            count, view = reader.since(2)
+            self.assertEqual(view[:, 0].tolist(), [0], "Readers should see candles from the new writer after reset.")
+            reader.close()
+        finally:
+            writer.close()
+
+    def test_second_writer(self):
+        # A block should not be taken over while its writer is running
+        self.writer.append(self.candles(0, 2))
+        with self.assertRaises(FileExistsError):
+            pb.PriceBusWriter(datasource_symbol_id=-1, capacity=self.__capacity)
+        self.assertEqual(self.reader.count, 2, "Refused writer should not reset the bus.")
+
+    def test_not_ready(self):
+        # A block whose header the writer has not initialised yet should look the same as no writer
+        shm = shared_memory.SharedMemory(name=pb.shared_memory_name(-4), create=True, size=1024)
+        try:
+            with self.assertRaises(FileNotFoundError):
+                pb.PriceBusReader(datasource_symbol_id=-4)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def test_replaced(self):
+        # A new writer with a different capacity replaces the block left by a writer that died. Readers still attached
+        # to the old block should be told to attach again.
+        process = multiprocessing.Process(target=write_and_die, args=(-5, self.__capacity))
+        process.start()
+        process.join()
+        reader = pb.PriceBusReader(datasource_symbol_id=-5)
+
+        writer = pb.PriceBusWriter(datasource_symbol_id=-5, capacity=self.__capacity + 2)
+        try:
+            with self.assertRaises(FileNotFoundError):
+                reader.since(0)
+            reader.close()
+
+            reader = pb.PriceBusReader(datasource_symbol_id=-5)
+            writer.append(self.candles(0, 1))
+            self.assertEqual(reader.capacity, self.__capacity + 2)
+            self.assertEqual(reader.since(0)[1][:, 0].tolist(), [0], "New reader should read from the new block.")
+            reader.close()
+        finally:
+            writer.close()
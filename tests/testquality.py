@@ -0,0 +1,128 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import definitions
+import algotrader.config as cfg
+from algotrader.connections.db import Database
+from algotrader.data import quality
+from algotrader.data.quality import DataQuality
+from algotrader.data.sync import Sync
+
+
+class TestDataQuality(unittest.TestCase):
+    @staticmethod
+    def candles(times):
+        # Candles with a small random walk and a spread of 0.0002
+        rng = np.random.default_rng(0)
+        bid = 1.2 + np.cumsum(rng.normal(scale=0.00001, size=len(times)))
+        return pd.DataFrame({'time': times, 'bid_open': bid, 'bid_close': bid, 'ask_open': bid + 0.0002,
+                             'ask_close': bid + 0.0002})
+
+    @staticmethod
+    def issues(issues, issue):
+        # (from_time, to_time) tuples for an issue type
+        issues = issues[issues['issue'] == issue]
+        return list(zip(issues['from_time'], issues['to_time']))
+
+    def test_clean(self):
+        issues = DataQuality.detect(self.candles(np.arange(1000, 2000)))
+        self.assertEqual(len(issues), 0, "There should be no issues in clean candles.")
+
+    def test_gaps_and_duplicates(self):
+        times = np.concatenate((np.arange(1000, 1100), np.arange(1099, 1200), np.arange(1250, 1300)))
+        issues = DataQuality.detect(self.candles(times))
+
+        self.assertEqual(self.issues(issues, quality.GAP), [(1200, 1249)])
+        self.assertEqual(self.issues(issues, quality.DUPLICATE), [(1099, 1099)])
+
+    def test_spread(self):
+        candles = self.candles(np.arange(1000, 1100))
+        candles.loc[10:12, 'ask_close'] = candles.loc[10:12, 'bid_close']
+        issues = DataQuality.detect(candles)
+
+        self.assertEqual(self.issues(issues, quality.SPREAD), [(1010, 1012)])
+
+    def test_outlier(self):
+        candles = self.candles(np.arange(1000, 1500))
+        candles.loc[400, ['bid_close', 'ask_close']] += 0.01
+        issues = DataQuality.detect(candles)
+
+        self.assertEqual(self.issues(issues, quality.OUTLIER), [(1400, 1400)])
+
+    def test_context(self):
+        # Gap at the boundary with the context is found and issues in the context are not reported
+        context = self.candles(np.concatenate((np.arange(900, 950), np.arange(960, 1000))))
+        candles = self.candles(np.arange(1005, 1100))
+        issues = DataQuality.detect(candles, context=context)
+
+        self.assertEqual(self.issues(issues, quality.GAP), [(1000, 1004)])
+
+    def test_exclude(self):
+        candles = self.candles(np.arange(1000, 1100))
+        issues = pd.DataFrame({'issue': [quality.SPREAD, quality.OUTLIER], 'from_time': [1010, 1011],
+                               'to_time': [1012, 1011]})
+        excluded = DataQuality.exclude(candles, issues)
+
+        self.assertEqual(len(excluded), 97)
+        self.assertNotIn(1011, excluded['time'].to_list())
+
+
+class TestDataQualityCheck(unittest.TestCase):
+    def setUp(self) -> None:
+        # Setup config and an empty SQLite database
+        cfg.Config().load(os.path.join(definitions.ROOT_DIR, 'tests', 'testconfig.yaml'))
+        self.dir = tempfile.TemporaryDirectory()
+        self.database = Database('sqlite', '', os.path.join(self.dir.name, 'test.db'), '', '')
+
+    def tearDown(self) -> None:
+        self.dir.cleanup()
+
+    def write(self, times):
+        # Writes candles, which checks them
+        candles = TestDataQuality.candles(times).assign(datasource_symbol_id=1, bid_high=1.3, bid_low=1.1, ask_high=1.3,
+                                                        ask_low=1.1, volume=1)
+        return Sync.add_candles(self.database, candles)
+
+    def recorded(self, issue):
+        # (from_time, to_time) tuples for an issue type recorded in the database
+        return TestDataQuality.issues(self.database.get_data_quality_issues(1), issue)
+
+    def test_check(self):
+        # Duplicate across the boundary between chunks should be found
+        self.write(np.arange(1000, 1100))
+        self.write(np.arange(1099, 1200))
+        self.assertEqual(self.recorded(quality.DUPLICATE), [(1099, 1099)])
+
+        # Checking again should not record the issues twice
+        self.write(np.arange(1250, 1300))
+        DataQuality.check(self.database, 1, self.database.get_candles(1, from_time=1250))
+        self.assertEqual(self.recorded(quality.GAP), [(1200, 1249)])
+        self.assertEqual(len(self.database.get_data_quality_issues(1)), 2)
+
+        # Backfilling part of the gap should leave only the rest of it
+        self.write(np.arange(1200, 1230))
+        self.assertEqual(self.recorded(quality.GAP), [(1230, 1249)])
+
+    def test_check_empty(self):
+        self.assertEqual(len(self.write(np.arange(1000, 1000))), 0, "There should be no issues in an empty chunk.")
+
+    def test_delete(self):
+        self.database.add_data_quality_issues(pd.DataFrame({'datasource_symbol_id': 1, 'issue': quality.GAP,
+                                                            'from_time': [100, 200], 'to_time': [150, 300]}))
+        self.database.delete_data_quality_issues(1, 120, 220)
+        self.assertEqual(self.recorded(quality.GAP), [(100, 119), (221, 300)])
+
+        self.database.delete_data_quality_issues(1, 240, 260)
+        self.assertEqual(self.recorded(quality.GAP), [(100, 119), (221, 239), (261, 300)])
+
+    def test_get_candles(self):
+        # Candles in issues should be skipped by readers
+        self.write(np.arange(1000, 1100))
+        self.write(np.arange(1099, 1200))
+        candles = DataQuality.get_candles(self.database, 1, from_time=1050, to_time=1150)
+        self.assertEqual(len(candles), 99, "Both candles at the duplicate time should be skipped.")
+        self.assertNotIn(1099, candles['time'].to_list())
@@ -0,0 +1,21 @@
+import unittest
+
+import pandas as pd
+
+from algotrader.data.sync import Sync
+
+
+class TestSync(unittest.TestCase):
+    def test_shard_symbols(self):
+        data = pd.DataFrame({'id': range(100), 'datasource_name': 'mt5',
+                             'symbol_name': [f'SYMBOL{i}' for i in range(100)], 'retrieve_price_data': True})
+
+        # Every symbol should be owned by exactly one shard
+        shards = [Sync.shard_symbols(data, shard, 3) for shard in range(3)]
+        ids = sorted(id for shard in shards for id in shard['id'])
+        self.assertEqual(ids, list(range(100)), "Every symbol should be owned by exactly one shard.")
+        self.assertTrue(all(len(shard) > 0 for shard in shards), "Symbols should be spread across all shards.")
+
+        # Ownership should not depend on the other symbols
+        self.assertTrue(Sync.shard_symbols(data[50:], 1, 3)['id'].isin(shards[1]['id']).all(),
+                        "Adding or removing symbols should not move other symbols between shards.")